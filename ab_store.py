@@ -0,0 +1,210 @@
+# ab_store.py
+
+import argparse
+import os
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from ab_testing import contingency, drop_thin_slices, two_proportion_test
+
+
+# ----------------------------
+# Incremental A/B Sufficient Statistics
+# ----------------------------
+# The guarantee experiment only needs order and return counts per arm. The store keeps
+# those counts for every Product_Category x Platform_Name cell, so a new batch of
+# orders is merged in O(batch) and every roll-up the A/B page shows is computed from
+# the cells in O(cells), without rereading order history.
+#
+# Sequential mode reports always-valid p-values from a mixture SPRT on the difference
+# in return rates (normal approximation, N(0, tau^2) mixing prior). The p-value of each
+# tracked slice is the running minimum of 1 / likelihood ratio over every merge, so it
+# stays valid however often the page is refreshed.
+#
+# Every batch records the source it came from and its own cell counts. sync() makes a
+# source's batches match what the source holds now, subtracting batches it no longer
+# has, so a re-exported or corrected file replaces its earlier version instead of being
+# counted twice. The dashboard files whatever dataset it loads (the order file or the
+# registry's batches) under DATASET_SOURCE, so switching between the two also replaces.
+STORE_DIMENSIONS = ['Product_Category', 'Platform_Name']
+COUNT_COLUMNS = ['Control_Orders', 'Control_Returns', 'Treatment_Orders', 'Treatment_Returns']
+ROLLUP_LEVELS = [None, 'Product_Category', 'Platform_Name', 'cell']
+MIXTURE_TAU = 0.01
+DEFAULT_STORE_PATH = "ab_store.pkl"
+DATASET_SOURCE = 'dataset'
+
+
+def always_valid_pvalues(table, tau=MIXTURE_TAU):
+    """mSPRT p-value (1 / mixture likelihood ratio) for every row of a contingency table."""
+    n0 = table['Control_Orders'].to_numpy(dtype=np.float64)
+    n1 = table['Treatment_Orders'].to_numpy(dtype=np.float64)
+    x0 = table['Control_Returns'].to_numpy(dtype=np.float64)
+    x1 = table['Treatment_Returns'].to_numpy(dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        diff = x1 / n1 - x0 / n0
+        pooled = (x0 + x1) / (n0 + n1)
+        var = pooled * (1 - pooled) * (1 / n0 + 1 / n1)
+        tau2 = tau ** 2
+        log_lr = 0.5 * np.log(var / (var + tau2)) + diff ** 2 * tau2 / (2 * var * (var + tau2))
+        p = np.minimum(1.0, np.exp(-log_lr))
+    # Empty arms or a degenerate variance carry no evidence yet
+    return pd.Series(np.where(np.isfinite(p), p, 1.0), index=table.index)
+
+
+class ABStatsStore:
+    def __init__(self, tau=MIXTURE_TAU):
+        self.tau = tau
+        self.cells = pd.DataFrame(
+            columns=COUNT_COLUMNS, dtype=np.int64,
+            index=pd.MultiIndex.from_tuples([], names=STORE_DIMENSIONS),
+        )
+        self.av_pvalues = {level: pd.Series(dtype=np.float64) for level in ROLLUP_LEVELS}
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def total_orders(self):
+        return int(self.cells[['Control_Orders', 'Treatment_Orders']].to_numpy().sum())
+
+    def has_batch(self, batch_id):
+        return any(b['id'] == batch_id for b in self.batches)
+
+    def source_batches(self, source):
+        return [b['id'] for b in self.batches if b.get('source') == source]
+
+    def merge(self, orders, batch_id=None, source=None):
+        """
+        Fold a batch of order rows into the store.
+
+        Batches are identified by ``batch_id`` (e.g. a file fingerprint) so replaying
+        the same batch is a no-op. Returns True when the batch was merged.
+        """
+        with self._lock:
+            if batch_id is not None and self.has_batch(batch_id):
+                return False
+            batch = contingency(orders, STORE_DIMENSIONS)
+            batch.index = batch.index.set_names(STORE_DIMENSIONS)
+            self.cells = (
+                self.cells.add(batch, fill_value=0)
+                .astype(np.int64)
+                .sort_index()
+            )
+            self.batches.append({
+                'id': batch_id,
+                'source': source,
+                'rows': len(orders),
+                'merged_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'cells': batch,
+            })
+            self._update_sequential()
+            return True
+
+    def remove(self, batch_ids):
+        """
+        Subtract merged batches from the store. Returns True when any batch was removed.
+
+        The always-valid p-values restart from the remaining counts, since their running
+        minimum assumes orders are only ever added.
+        """
+        with self._lock:
+            drop = [b for b in self.batches if b['id'] in batch_ids and 'cells' in b]
+            if not drop:
+                return False
+            for b in drop:
+                self.cells = self.cells.sub(b['cells'], fill_value=0)
+            self.cells = self.cells[self.cells.sum(axis=1) > 0].astype(np.int64)
+            self.batches = [b for b in self.batches if not any(b is d for d in drop)]
+            self.av_pvalues = {level: pd.Series(dtype=np.float64) for level in ROLLUP_LEVELS}
+            self._update_sequential()
+            return True
+
+    def sync(self, source, batches):
+        """
+        Make ``source``'s batches in the store exactly ``batches`` ({batch_id: loader}).
+
+        Batches the source no longer holds are removed and unseen ones merged; a loader
+        is only called for a batch that is actually merged. Returns True when the store
+        changed.
+        """
+        changed = self.remove([b for b in self.source_batches(source) if b not in batches])
+        for batch_id, load in batches.items():
+            if not self.has_batch(batch_id):
+                changed = self.merge(load(), batch_id=batch_id, source=source) or changed
+        return changed
+
+    def _update_sequential(self):
+        for level in ROLLUP_LEVELS:
+            current = always_valid_pvalues(self.rollup(level), self.tau)
+            previous = self.av_pvalues[level].reindex(current.index, fill_value=1.0)
+            self.av_pvalues[level] = np.fmin(previous, current)
+
+    def rollup(self, level=None):
+        """Contingency table for a roll-up level: None (overall), a dimension or 'cell'."""
+        if level == 'cell':
+            return self.cells
+        if level is None:
+            totals = self.cells.sum().to_frame('All Orders').T
+            return totals.astype(np.int64)
+        return self.cells.groupby(level=level, observed=True).sum()
+
+    def results(self, level=None, alpha=0.05, min_orders=0, sequential=False):
+        """
+        Test statistics for a roll-up level, as ab_testing.two_proportion_test().
+
+        With ``sequential`` the P_Value and Significant columns come from the stored
+        always-valid p-values instead of the fixed-horizon z-test.
+        """
+        out = two_proportion_test(drop_thin_slices(self.rollup(level), min_orders), alpha)
+        out['AV_P_Value'] = self.av_pvalues[level].reindex(out.index, fill_value=1.0).to_numpy()
+        if sequential:
+            out['P_Value'] = out['AV_P_Value']
+            out['Significant'] = out['P_Value'] < alpha
+        return out
+
+    def save(self, path=DEFAULT_STORE_PATH):
+        tmp = path + '.tmp'
+        pd.to_pickle(self, tmp)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=DEFAULT_STORE_PATH):
+        if os.path.exists(path):
+            return pd.read_pickle(path)
+        return cls()
+
+
+# ----------------------------
+# CLI: merge new order batches
+# ----------------------------
+def main(argv=None):
+    from ingest import load_orders
+
+    parser = argparse.ArgumentParser(description="Merge order batches into the A/B statistics store.")
+    parser.add_argument('batches', nargs='+', help="order CSV files to merge; a changed file replaces its earlier version")
+    parser.add_argument('--store', default=DEFAULT_STORE_PATH)
+    args = parser.parse_args(argv)
+
+    store = ABStatsStore.load(args.store)
+    for path in args.batches:
+        orders = load_orders(path)
+        fingerprint = orders.attrs['fingerprint']
+        merged = store.sync(os.path.abspath(path), {fingerprint: lambda: orders})
+        print(f"{path}: {'merged' if merged else 'already in store'} ({len(orders):,} rows)")
+    store.save(args.store)
+    print(f"{args.store}: {store.total_orders:,} orders across {len(store.batches)} batches")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+# ab_testing.py
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+
+# ----------------------------
+# Guarantee Experiment Analysis
+# ----------------------------
+# Orders without a guarantee are the control arm (Has_Guarantee == 0) and orders with
+# one are the treatment arm. Every slice is reduced to a 2x2 contingency table
+# (arm x returned) in a single bincount pass, and the tests below run on all slices
+# at once as array operations.
+ARM_COLUMN = 'Has_Guarantee'
+OUTCOME_COLUMN = 'Has_Return'
+# Row-level columns the page-level analyses read
+AB_COLUMNS = [ARM_COLUMN, OUTCOME_COLUMN, 'Product_Category', 'Platform_Name', 'Delivery_Status']
+
+
+def _slice_codes(keys):
+    """Combine one or more key columns into a single dense code per row."""
+    codes = np.zeros(len(keys[0]), dtype=np.int64)
+    levels = []
+    for key in keys:
+        if isinstance(key.dtype, pd.CategoricalDtype):
+            key_codes = key.cat.codes.to_numpy().astype(np.int64)
+            uniques = key.cat.categories
+        else:
+            key_codes, uniques = pd.factorize(key)
+        size = len(uniques)
+        # Missing keys (code -1) are pushed out of range and dropped later
+        codes = np.where((codes < 0) | (key_codes < 0), -1, codes * size + key_codes)
+        levels.append(pd.Index(uniques, name=key.name))
+    return codes, levels
+
+
+def contingency(df, by=None, arm=None, outcome=None):
+    """
+    Order and return counts per slice and arm.
+
+    ``by`` is a column name, a list of column names, or a Series aligned with ``df``
+    (e.g. a derived segment label). ``arm`` and ``outcome`` default to the guarantee
+    flag and the return flag. Returns a frame indexed by slice with
+    Control_Orders, Control_Returns, Treatment_Orders and Treatment_Returns; empty
+    slices are dropped.
+    """
+    arm = df[ARM_COLUMN] if arm is None else arm
+    outcome = df[OUTCOME_COLUMN] if outcome is None else outcome
+    arm_codes = arm.to_numpy().astype(np.int64)
+    returned = outcome.to_numpy().astype(np.float64)
+
+    if by is None:
+        codes, levels = np.zeros(len(df), dtype=np.int64), None
+        n_slices = 1
+    else:
+        keys = by if isinstance(by, list) else [by]
+        keys = [df[k] if isinstance(k, str) else k for k in keys]
+        codes, levels = _slice_codes(keys)
+        n_slices = int(np.prod([len(level) for level in levels]))
+
+    valid = (codes >= 0) & ((arm_codes == 0) | (arm_codes == 1))
+    cell = codes[valid] * 2 + arm_codes[valid]
+    orders = np.bincount(cell, minlength=2 * n_slices).reshape(n_slices, 2)
+    returns = np.bincount(cell, weights=returned[valid], minlength=2 * n_slices).reshape(n_slices, 2)
+
+    if levels is None:
+        index = pd.Index(['All Orders'])
+    elif len(levels) == 1:
+        index = levels[0]
+    else:
+        index = pd.MultiIndex.from_product(levels)
+    table = pd.DataFrame({
+        'Control_Orders': orders[:, 0],
+        'Control_Returns': returns[:, 0].astype(np.int64),
+        'Treatment_Orders': orders[:, 1],
+        'Treatment_Returns': returns[:, 1].astype(np.int64),
+    }, index=index)
+    return table[(table['Control_Orders'] + table['Treatment_Orders']) > 0]
+
+
+def two_proportion_test(table, alpha=0.05):
+    """
+    Two-proportion z-test and Pearson chi-square for every row of a contingency table.
+
+    Adds control/treatment return rates, the treatment-minus-control difference with
+    its (1 - alpha) Wald confidence interval, the pooled z statistic, the 1-dof
+    chi-square statistic (equal to z squared for a 2x2 table without continuity
+    correction) and the shared two-sided p-value. Slices where either arm is empty
+    get NaN statistics.
+    """
+    n0 = table['Control_Orders'].to_numpy(dtype=np.float64)
+    n1 = table['Treatment_Orders'].to_numpy(dtype=np.float64)
+    x0 = table['Control_Returns'].to_numpy(dtype=np.float64)
+    x1 = table['Treatment_Returns'].to_numpy(dtype=np.float64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p0 = x0 / n0
+        p1 = x1 / n1
+        diff = p1 - p0
+        pooled = (x0 + x1) / (n0 + n1)
+        se_pooled = np.sqrt(pooled * (1 - pooled) * (1 / n0 + 1 / n1))
+        z = np.where(se_pooled > 0, diff / se_pooled, np.nan)
+        se_diff = np.sqrt(p0 * (1 - p0) / n0 + p1 * (1 - p1) / n1)
+
+    z_crit = stats.norm.ppf(1 - alpha / 2)
+    out = table.copy()
+    out['Control_Return_Rate'] = p0
+    out['Treatment_Return_Rate'] = p1
+    out['Difference'] = diff
+    out['CI_Low'] = diff - z_crit * se_diff
+    out['CI_High'] = diff + z_crit * se_diff
+    out['Z'] = z
+    out['Chi2'] = z ** 2
+    out['P_Value'] = 2 * stats.norm.sf(np.abs(z))
+    out['Significant'] = out['P_Value'] < alpha
+    return out
+
+
+def total_orders(results):
+    """Orders in either arm across a results table; 0 when there is nothing to test."""
+    return int(results[['Control_Orders', 'Treatment_Orders']].to_numpy().sum())
+
+
+def drop_thin_slices(table, min_orders):
+    """Keep slices where both arms have at least ``min_orders`` orders."""
+    if not min_orders:
+        return table
+    return table[(table['Control_Orders'] >= min_orders) & (table['Treatment_Orders'] >= min_orders)]
+
+
+def analyze(df, by=None, alpha=0.05, min_orders=0):
+    """Contingency counts plus test statistics, optionally dropping thin slices."""
+    return two_proportion_test(drop_thin_slices(contingency(df, by), min_orders), alpha)
+
+
+def chi_square_independence(df, row, outcome=OUTCOME_COLUMN):
+    """Pearson chi-square test of independence between ``row`` and the outcome flag."""
+    codes, levels = _slice_codes([df[row]])
+    returned = df[outcome].to_numpy().astype(np.int64)
+    valid = codes >= 0
+    observed = np.bincount(codes[valid] * 2 + returned[valid], minlength=2 * len(levels[0]))
+    observed = observed.reshape(-1, 2)
+    observed = observed[observed.sum(axis=1) > 0][:, observed.sum(axis=0) > 0]
+    if observed.shape[0] < 2 or observed.shape[1] < 2:
+        return {'chi2': np.nan, 'p_value': np.nan, 'dof': 0}
+    chi2, p_value, dof, _ = stats.chi2_contingency(observed, correction=False)
+    return {'chi2': chi2, 'p_value': p_value, 'dof': dof}
+
+
+def to_long(results, label):
+    """Reshape test results into Group/Return Rate rows for the grouped bar charts."""
+    long = results[['Control_Return_Rate', 'Treatment_Return_Rate']].copy()
+    long.index = long.index.rename(label)
+    long = long.reset_index().melt(id_vars=label, var_name='Group', value_name='Return Rate')
+    long['Group'] = long['Group'].map({
+        'Control_Return_Rate': 'Control',
+        'Treatment_Return_Rate': 'Treatment',
+    })
+    return long
+
+
+def _slice_names(results, limit):
+    names = [
+        f"**{' × '.join(map(str, label)) if isinstance(label, tuple) else label}** ({diff * 100:+.2f}pp)"
+        for label, diff in results['Difference'].items()
+    ]
+    extra = f" and {len(names) - limit} more" if len(names) > limit else ""
+    return ", ".join(names[:limit]) + extra
+
+
+def findings(results, noun, limit=3):
+    """
+    Markdown bullets summarising a results table: the slices where the guarantee
+    significantly lowered or raised the return rate (largest effects first) and how
+    many slices show no significant difference.
+    """
+    if not len(results):
+        return f"- No {noun} has enough orders in both groups to test."
+    significant = results[results['Significant']]
+    lower = significant[significant['Difference'] < 0].sort_values('Difference')
+    higher = significant[significant['Difference'] > 0].sort_values('Difference', ascending=False)
+    bullets = []
+    if len(lower):
+        bullets.append(f"Guarantees significantly **lowered** the return rate for {_slice_names(lower, limit)}.")
+    if len(higher):
+        bullets.append(f"Guarantees significantly **raised** the return rate for {_slice_names(higher, limit)}.")
+    rest = len(results) - len(lower) - len(higher)
+    if rest:
+        bullets.append(f"{rest} of {len(results)} {noun} slices show no significant difference between groups.")
+    return "\n".join(f"- {bullet}" for bullet in bullets)
@@ -0,0 +1,172 @@
+# aggregates.py
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import reduce
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+from binning import PRICE_EDGES, as_categorical, bin_codes
+from ingest import CHUNK_ROWS, is_parquet, iter_order_chunks
+from streaming_stats import CoMoments, QuantileSketch
+
+
+# ----------------------------
+# EDA Aggregate Cube
+# ----------------------------
+# One grouped pass over the order table produces order counts and return counts for
+# every combination of the EDA dimensions. Each chart is then a roll-up of this
+# small table instead of a fresh groupby over the raw rows. The correlation heatmap,
+# the order value histogram and the value percentiles come from mergeable summaries
+# (streaming_stats), so the same result can be built from the whole table at once or
+# from chunks, row groups and monthly partitions merged together.
+CUBE_DIMENSIONS = ['Product_Category', 'Platform_Name', 'Has_Guarantee', 'Delivery_Status', 'Price_Bin']
+CORR_COLUMNS = ['Has_Return', 'Order_Value_Numeric', 'Actual_Delivery_Days', 'Guarantee_Shown']
+HIST_BINS = 50
+VALUE_PERCENTILES = [0.1, 0.25, 0.5, 0.75, 0.9, 0.99]
+# Every column build_eda_cube() reads
+CUBE_COLUMNS = CUBE_DIMENSIONS[:-1] + CORR_COLUMNS
+# Bump when the layout of partial_eda() output changes (partials are cached on disk)
+PARTIAL_VERSION = 2
+
+
+def partial_eda(df, price_edges=PRICE_EDGES, price_codes=None):
+    """
+    Mergeable EDA aggregates of an order table or one chunk of it.
+
+    ``price_codes`` can carry a bin index precomputed with binning.bin_codes() so the
+    price band is never materialised as a column on ``df``.
+    """
+    if price_codes is None:
+        price_codes = bin_codes(df['Order_Value_Numeric'].to_numpy(), price_edges)
+    price_bin = pd.Series(as_categorical(price_codes, price_edges), index=df.index, name='Price_Bin')
+    keys = [df[c] for c in CUBE_DIMENSIONS[:-1]] + [price_bin]
+    cube = (
+        df['Has_Return']
+        .groupby(keys, observed=True, dropna=False)
+        .agg(['size', 'sum'])
+        .rename(columns={'size': 'Total_Orders', 'sum': 'Returns'})
+        .reset_index()
+    )
+    return {
+        'rows': len(df),
+        'cube': cube,
+        'moments': CoMoments.from_array(df[CORR_COLUMNS].to_numpy(dtype=np.float64), CORR_COLUMNS),
+        'values': QuantileSketch().update(df['Order_Value_Numeric'].to_numpy()),
+    }
+
+
+def merge_eda(partials):
+    """Combine partials from partial_eda() into one partial."""
+    partials = list(partials)
+    cube = (
+        pd.concat([p['cube'] for p in partials], ignore_index=True)
+        .groupby(CUBE_DIMENSIONS, observed=True, dropna=False)[['Total_Orders', 'Returns']]
+        .sum()
+        .reset_index()
+    )
+    # Chunks read separately carry their own category sets; restore one categorical per dimension
+    for col in ['Product_Category', 'Platform_Name', 'Delivery_Status']:
+        cube[col] = cube[col].astype('category')
+    return {
+        'rows': sum(p['rows'] for p in partials),
+        'cube': cube,
+        'moments': reduce(CoMoments.merge, [p['moments'] for p in partials]),
+        'values': reduce(QuantileSketch.merge, [p['values'] for p in partials]),
+    }
+
+
+def finish_eda(partial):
+    """Everything the EDA page plots, from a (merged) partial."""
+    values = partial['values']
+    return {
+        'rows': partial['rows'],
+        'cube': partial['cube'],
+        'corr': partial['moments'].corr(),
+        'hist': values.histogram(HIST_BINS),
+        'percentiles': pd.Series(values.quantile(VALUE_PERCENTILES), index=VALUE_PERCENTILES),
+    }
+
+
+def build_eda_cube(df, price_edges=PRICE_EDGES, price_codes=None):
+    """Aggregate the order table once into everything the EDA page plots."""
+    return finish_eda(partial_eda(df, price_edges, price_codes))
+
+
+def rollup(cube, dims):
+    """Collapse the cube onto ``dims`` and derive the return rate per group."""
+    out = (
+        cube.groupby(dims, observed=True)[['Total_Orders', 'Returns']]
+        .sum()
+        .reset_index()
+    )
+    out = out[out['Total_Orders'] > 0]
+    out['Return_Rate'] = out['Returns'] / out['Total_Orders']
+    return out
+
+
+# ----------------------------
+# Out-of-Core EDA Aggregates
+# ----------------------------
+# For order files larger than memory the same aggregates are built from chunks: each
+# chunk is reduced with partial_eda() and the partials are merged, so peak memory is
+# set by the chunk size, not the file size. Parquet row groups can be reduced in a
+# process pool; CSV text has no row groups and is streamed serially.
+def _row_group_partial(path, row_group, price_edges, chunk_rows):
+    chunks = iter_order_chunks(path, chunk_rows, columns=CUBE_COLUMNS, row_groups=[row_group])
+    return merge_eda(partial_eda(chunk, price_edges) for chunk in chunks)
+
+
+def build_eda_cube_chunked(source, price_edges=PRICE_EDGES, chunk_rows=CHUNK_ROWS, workers=1):
+    """
+    build_eda_cube() for a CSV or Parquet file streamed in chunks of ``chunk_rows``.
+
+    With ``workers`` > 1 the row groups of a Parquet file are reduced in that many
+    processes (each holding at most one chunk at a time).
+    """
+    if workers > 1 and isinstance(source, str) and is_parquet(source):
+        import pyarrow.parquet as pq
+        n_groups = pq.ParquetFile(source).metadata.num_row_groups
+        # spawn, not fork: the dashboard process is multi-threaded
+        with ProcessPoolExecutor(max_workers=min(workers, max(n_groups, 1)), mp_context=get_context('spawn')) as pool:
+            futures = [
+                pool.submit(_row_group_partial, source, i, price_edges, chunk_rows)
+                for i in range(n_groups)
+            ]
+            partials = [f.result() for f in as_completed(futures)]
+    else:
+        # Fold as we go so only one chunk and the running totals are alive at a time
+        partial = None
+        for chunk in iter_order_chunks(source, chunk_rows, columns=CUBE_COLUMNS):
+            current = partial_eda(chunk, price_edges)
+            partial = current if partial is None else merge_eda([partial, current])
+        partials = [] if partial is None else [partial]
+    if not partials:
+        raise ValueError(f"{source} has no orders")
+    return finish_eda(merge_eda(partials))
+
+
+# ----------------------------
+# CLI: out-of-core EDA aggregates
+# ----------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute the EDA aggregates of an order file in chunks.")
+    parser.add_argument('orders', help="order file (.csv or .parquet)")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help="processes across Parquet row groups (default: all cores)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    eda = build_eda_cube_chunked(args.orders, chunk_rows=args.chunk_rows, workers=args.workers)
+    elapsed = time.perf_counter() - start
+    print(f"{eda['rows']:,} orders aggregated in {elapsed:.1f}s ({len(eda['cube']):,} cube cells)")
+    print(rollup(eda['cube'], 'Product_Category').sort_values('Return_Rate', ascending=False).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,18 @@
 # app.py
 
 import streamlit as st
-import pandas as pd
 from datetime import date
-import seaborn as sns
-import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
+import functools
+import os
 import warnings
+import diagnostics
 warnings.filterwarnings("ignore")
 
+# Startup budget: the text-only pages (Introduction, Project Summary) must render without
+# importing pandas/numpy, the plotting stack or the ML stack and without loading the order
+# data, so a cold replica is ready quickly. Everything heavy is imported inside the page or
+# cached helper that needs it. `python startup_budget.py` measures each page from a cold
+# process and fails when a text page exceeds the budget or pulls in a heavy module.
 
 # Page configuration
 st.set_page_config(
@@ -19,7 +22,7 @@ st.set_page_config(
 )
 
 
-# Sidebar Navigation
+# Sidebar Navigation (the Diagnostics page is listed only when instrumentation is enabled)
 st.image("wayfair_logo.png", use_container_width=True)
 st.sidebar.title("Wayfair Analytics Dashboard")
 selected_page = st.sidebar.selectbox(
@@ -28,16 +31,287 @@ selected_page = st.sidebar.selectbox(
         "Introduction",
         "Exploratory Data Analysis",
         "Machine Learning Models",
+        "What-If Simulator",
         "A/B Testing Insights",
+        "Order Scoring",
         "Project Summary"
-    ]
+    ] + (["Diagnostics"] if diagnostics.enabled() else [])
 )
 
-# Load data once globally
-@st.cache_data
-def load_data():
-    return pd.read_csv("wayfair_part2.csv")
-df = load_data()
+# Load data once per process and data version, on first use by a page that needs it. A
+# partitioned order history under REGISTRY_ROOT (managed with `python registry.py append`)
+# takes precedence over the single order file, which is read with typed columns through
+# a Parquet sidecar. The frame is shared by every session without per-rerun copies, so
+# it must never be mutated.
+DATA_PATH = "wayfair_part2.csv"
+REGISTRY_ROOT = os.path.join("data", "orders")
+REGISTRY_MANIFEST = os.path.join(REGISTRY_ROOT, "_registry.json")
+
+# Read-only serving: with DASHBOARD_BUNDLE pointing at an artifact bundle built offline
+# (`python bundle.py build`), the data pages read their tables, model and pre-built
+# charts from the bundle and never load order data, fit a model or aggregate
+BUNDLE_ENV = "DASHBOARD_BUNDLE"
+
+def serving():
+    return bool(os.environ.get(BUNDLE_ENV))
+
+def use_registry():
+    return os.path.exists(REGISTRY_MANIFEST)
+
+def data_version():
+    """Cheap stamp of the current data; appending a month, replacing the file or publishing a bundle changes it."""
+    if serving():
+        from bundle import manifest_path
+        path = manifest_path(os.environ[BUNDLE_ENV])
+        return path, os.stat(path).st_mtime_ns
+    stat = os.stat(REGISTRY_MANIFEST if use_registry() else DATA_PATH)
+    return stat.st_mtime_ns, stat.st_size
+
+@diagnostics.timed('load_data', rows=len, cached=True)
+@st.cache_resource(max_entries=1, show_spinner="Loading order data...")
+def load_data(version=None):
+    diagnostics.cache_miss()
+    if use_registry():
+        return get_registry(version).read()
+    from ingest import load_orders
+    return load_orders(DATA_PATH)
+
+@diagnostics.timed('get_bundle', rows=lambda bundle: bundle.rows, cached=True)
+@st.cache_resource(max_entries=1, show_spinner="Opening artifact bundle...")
+def get_bundle(version=None):
+    diagnostics.cache_miss()
+    import charts
+    from bundle import Bundle
+    bundle = Bundle(os.environ[BUNDLE_ENV])
+    bundle.seed_figure_cache(charts.figure_cache)
+    return bundle
+
+@st.cache_resource(max_entries=1)
+def get_registry(version=None):
+    from registry import DatasetRegistry
+    return DatasetRegistry(REGISTRY_ROOT)
+
+# Order data larger than this is never loaded into memory for the EDA page: its
+# aggregates come from the registry's cached monthly partials, or are streamed from the
+# order file in chunks, so row-level filters and customer segments are unavailable then
+OUT_OF_CORE_BYTES = 2 * 1024 ** 3
+
+def out_of_core():
+    if use_registry():
+        return get_registry(data_version()).memory_bytes > OUT_OF_CORE_BYTES
+    return os.path.getsize(DATA_PATH) > OUT_OF_CORE_BYTES
+
+# History aggregates for a date range: cached month partials plus a scan of the boundary months
+@diagnostics.timed('get_registry_cube', rows=lambda eda: eda['rows'], cached=True)
+@st.cache_data(max_entries=32, show_spinner="Aggregating order history...")
+def get_registry_cube(_registry, fingerprint, start=None, end=None):
+    diagnostics.cache_miss()
+    return _registry.aggregates(start, end)
+
+# Keyed on the file's size and mtime, since hashing a larger-than-memory file is a full read.
+# Uses a current Parquet sidecar when there is one, so row groups are reduced on every core.
+@diagnostics.timed('get_eda_cube_chunked', rows=lambda eda: eda['rows'], cached=True)
+@st.cache_data(show_spinner="Streaming order aggregates...")
+def get_eda_cube_chunked(path, mtime_ns, size, price_edges=None):
+    diagnostics.cache_miss()
+    from aggregates import build_eda_cube_chunked
+    from binning import PRICE_EDGES
+    from ingest import fresh_sidecar
+    source = fresh_sidecar(path) or path
+    return build_eda_cube_chunked(source, price_edges or PRICE_EDGES, workers=os.cpu_count())
+
+# Price-band index computed once per dataset and bin layout, kept outside df
+@st.cache_resource
+def get_price_codes(_df, fingerprint, edges=None):
+    from binning import PRICE_EDGES, bin_codes
+    return bin_codes(_df['Order_Value_Numeric'].to_numpy(), edges or PRICE_EDGES)
+
+# Aggregates behind every EDA chart, keyed on the data fingerprint (and the active filter
+# combination, whose selected row positions are passed unhashed) rather than hashing df
+@diagnostics.timed('get_eda_cube', rows=lambda eda: eda['rows'], cached=True)
+@st.cache_data(max_entries=32)
+def get_eda_cube(_df, fingerprint, filters=None, _rows=None, price_edges=None):
+    diagnostics.cache_miss()
+    from aggregates import CUBE_COLUMNS, build_eda_cube
+    from binning import PRICE_EDGES
+    from filters import take_rows
+    price_edges = price_edges or PRICE_EDGES
+    codes = get_price_codes(_df, fingerprint, price_edges)
+    if _rows is not None:
+        return build_eda_cube(take_rows(_df, _rows, CUBE_COLUMNS), price_edges, codes[_rows])
+    return build_eda_cube(_df, price_edges, codes)
+
+# Customer segments: PCA + MiniBatchKMeans fitted once per dataset. Returns the fitted
+# segmenter and the labelled customer table (also the history lookup for scoring new orders)
+@diagnostics.timed('get_segmentation', rows=lambda fitted: len(fitted[1]), cached=True)
+@st.cache_resource(show_spinner="Fitting customer segments...")
+def get_segmentation(_df, fingerprint):
+    diagnostics.cache_miss()
+    from segmentation import fit_segments
+    if 'Customer_ID' not in _df.columns:
+        return None, None
+    return fit_segments(_df)
+
+def get_order_segments(_df, fingerprint):
+    from segmentation import order_segments
+    _, customers = get_segmentation(_df, fingerprint)
+    if customers is None:
+        return None
+    return order_segments(_df, customers)
+
+# Segment profile for the EDA page. With filters active, customers are described by
+# their selected orders only and labelled with the segmenter fitted on all orders.
+@diagnostics.timed('get_segment_summary', cached=True)
+@st.cache_data(max_entries=32)
+def get_segment_summary(_df, fingerprint, filters=None, _rows=None):
+    diagnostics.cache_miss()
+    from features import customer_features
+    from filters import take_rows
+    from segmentation import segment_summary
+    segmenter, customers = get_segmentation(_df, fingerprint)
+    if customers is None:
+        return None
+    if _rows is not None:
+        selected = take_rows(_df, _rows, ['Customer_ID', 'Has_Return', 'Order_Value_Numeric'])
+        customers = customer_features(selected)
+        customers['Customer_Segment'] = segmenter.predict(customers)
+    return segment_summary(customers)
+
+# Return-risk model: loaded from its joblib artifact, trained only when the data fingerprint changes
+@diagnostics.timed('get_return_model', rows=lambda artifact: artifact['train_rows'], cached=True)
+@st.cache_resource(show_spinner="Loading return-risk model...")
+def get_return_model(_df, fingerprint):
+    diagnostics.cache_miss()
+    from model import load_or_train
+    segmenter, _ = get_segmentation(_df, fingerprint)
+    return load_or_train(_df, fingerprint, segmenter)
+
+# What-if simulator: the whole order base scored once through the return model's additive
+# terms, so a scenario recomputes only the edited columns
+@diagnostics.timed('get_whatif', rows=lambda whatif: whatif.rows, cached=True)
+@st.cache_resource(max_entries=1, show_spinner="Scoring the order base...")
+def get_whatif(_df, fingerprint):
+    diagnostics.cache_miss()
+    from model import training_customers
+    from whatif import WhatIf
+    artifact = get_return_model(_df, fingerprint)
+    # Customer history built as in training, not the all-order table from get_segmentation
+    return WhatIf(artifact['pipeline'], _df, training_customers(_df), artifact.get('segmenter'))
+
+# Guarantee experiment counts live in an incremental store; the loaded dataset is synced
+# into it as one source (replacing whatever version of the data it held before) and
+# further batches arrive via `python ab_store.py`. The store file's mtime is part of the
+# cache key, so those merges show up on the next rerun.
+AB_STORE_PATH = "ab_store.pkl"
+
+def ab_store_version():
+    try:
+        return os.stat(AB_STORE_PATH).st_mtime_ns
+    except OSError:
+        return None
+
+@diagnostics.timed('get_ab_store', rows=lambda store: store.total_orders, cached=True)
+@st.cache_resource(max_entries=1)
+def get_ab_store(_df, fingerprint, store_version=None):
+    diagnostics.cache_miss()
+    from ab_store import DATASET_SOURCE, ABStatsStore
+    from ab_testing import AB_COLUMNS
+    store = ABStatsStore.load(AB_STORE_PATH)
+    if use_registry():
+        # One store batch per registry batch, so appending a month merges only that month
+        registry = get_registry(data_version())
+        batches = {
+            batch['id']: functools.partial(registry.read_batch, batch['id'], AB_COLUMNS)
+            for batch in registry.manifest['batches']
+        }
+    else:
+        batches = {fingerprint: lambda: _df}
+    changed = store.sync(DATASET_SOURCE, batches)
+    if changed:
+        try:
+            store.save(AB_STORE_PATH)
+        except OSError:
+            pass
+    return store
+
+# Slices that need row-level data (derived customer segments, delivery status). With
+# filters active every slice is computed from the selected rows, since the store only
+# holds category x platform counts.
+@diagnostics.timed('get_ab_row_results', cached=True)
+@st.cache_data(max_entries=32)
+def get_ab_row_results(_df, fingerprint, filters=None, _rows=None):
+    diagnostics.cache_miss()
+    from ab_testing import AB_COLUMNS, analyze, chi_square_independence
+    from filters import take_rows
+    orders = _df if _rows is None else take_rows(_df, _rows, AB_COLUMNS)
+    segments = get_order_segments(_df, fingerprint)
+    if segments is not None and _rows is not None:
+        segments = segments.iloc[_rows]
+    results = {
+        'segment': analyze(orders, segments) if segments is not None else None,
+        'delivery': chi_square_independence(orders, 'Delivery_Status'),
+    }
+    if _rows is not None:
+        results.update({
+            'overall': analyze(orders),
+            'product': analyze(orders, 'Product_Category', min_orders=100),
+            'platform': analyze(orders, 'Platform_Name'),
+            'category_platform': analyze(orders, ['Product_Category', 'Platform_Name'], min_orders=30),
+        })
+    return results
+
+# Posting-list index over the filter dimensions, built once per dataset
+@diagnostics.timed('get_dimension_index', rows=lambda index: index.n_rows, cached=True)
+@st.cache_resource(show_spinner="Indexing order dimensions...")
+def get_dimension_index(_df, fingerprint):
+    diagnostics.cache_miss()
+    from filters import DimensionIndex
+    return DimensionIndex(_df)
+
+FILTER_LABELS = {
+    'Product_Category': "Product Category",
+    'Platform_Name': "Platform",
+    'Delivery_Status': "Delivery Status",
+    'Has_Guarantee': "Guarantee",
+}
+GUARANTEE_LABELS = {0: 'No Guarantee', 1: 'Guarantee Shown'}
+
+def sidebar_date_range(bounds):
+    import pandas as pd
+    if bounds is None:
+        return None
+    first, last = (pd.Timestamp(d).date() for d in bounds)
+    picked = st.sidebar.date_input("Order Date Range", value=(first, last), min_value=first, max_value=last)
+    # A half-picked range (one date) or the full span is no filter
+    if not isinstance(picked, (tuple, list)) or len(picked) != 2 or tuple(picked) == (first, last):
+        return None
+    return tuple(picked)
+
+def sidebar_filters(index):
+    from filters import FILTER_DIMENSIONS
+    st.sidebar.markdown("### Filters")
+    selections = {}
+    for dim in FILTER_DIMENSIONS:
+        if dim not in index.levels:
+            continue
+        selections[dim] = st.sidebar.multiselect(
+            FILTER_LABELS[dim], index.options(dim),
+            format_func=GUARANTEE_LABELS.get if dim == 'Has_Guarantee' else str,
+        )
+    return selections, sidebar_date_range(index.date_bounds)
+
+# Global filters (EDA and A/B pages): the selected row positions (None when unfiltered)
+# and a hashable key for the filter combination
+def global_filters(df):
+    from filters import filter_key
+    dimension_index = get_dimension_index(df, df.attrs.get('fingerprint'))
+    selections, date_range = sidebar_filters(dimension_index)
+    filter_rows = dimension_index.select(selections, date_range)
+    if filter_rows is None:
+        return None, None
+    st.sidebar.caption(f"{len(filter_rows):,} of {len(df):,} orders selected")
+    return filter_rows, filter_key(selections, date_range)
+
 # ----------------------------
 # Introduction with Full Executive Summary
 # ----------------------------
@@ -84,149 +358,184 @@ def show_introduction():
 # EDA Section
 # ----------------------------
 def show_eda():
+    from aggregates import rollup
+    from charts import bar, heatmap, histogram, scatter, show_chart
+
     st.title("Exploratory Data Analysis")
     st.markdown("""
     This section explores key return behaviors and customer insights derived from Wayfair's December 2016 order-level dataset.
     Charts are based on confirmed analysis from the project notebook.
     """)
 
+    if serving():
+        df = None
+        bundle = get_bundle(data_version())
+        eda = bundle.eda()
+        st.caption(
+            f"Serving bundle {bundle.version}: {eda['rows']:,} orders, built {bundle.manifest['built_at']}; "
+            "filters are unavailable."
+        )
+    elif out_of_core() and use_registry():
+        df = None
+        registry = get_registry(data_version())
+        st.sidebar.markdown("### Filters")
+        date_range = sidebar_date_range(registry.date_bounds)
+        eda = get_registry_cube(registry, registry.fingerprint, *(date_range or (None, None)))
+        if eda is None:
+            st.warning("No orders in the selected date range.")
+            return
+        st.caption(
+            f"Out-of-core mode: {eda['rows']:,} orders from {len(registry.months)} monthly partitions; "
+            "only the date filter is available."
+        )
+    elif out_of_core():
+        df = None
+        stat = os.stat(DATA_PATH)
+        eda = get_eda_cube_chunked(DATA_PATH, stat.st_mtime_ns, stat.st_size)
+        st.caption(f"Out-of-core mode: {eda['rows']:,} orders aggregated from disk in chunks; filters are unavailable.")
+    else:
+        df = load_data(data_version())
+        filter_rows, active_filters = global_filters(df)
+        if filter_rows is not None and not len(filter_rows):
+            st.warning("No orders match the selected filters.")
+            return
+        eda = get_eda_cube(df, df.attrs.get('fingerprint'), active_filters, filter_rows)
+    cube = eda['cube']
+
     # 1. Return Rate by Product Category (Corrected)
-    st.subheader("1. Return Rate by Product Category")
-    cat_df = (
-        df.groupby('Product_Category')
-        .agg(Total_Orders=('Order_ID', 'count'), Return_Rate=('Has_Return', 'mean'))
-        .reset_index()
-        .query("Total_Orders > 100")
-        .sort_values('Return_Rate', ascending=False)
-        .head(10)
-    )
-    fig1, ax1 = plt.subplots(figsize=(10, 6))
-    sns.barplot(data=cat_df, x='Product_Category', y='Return_Rate', palette='Reds_r', ax=ax1)
-    ax1.set_title("Top 10 Product Categories by Return Rate", fontsize=16)
-    ax1.set_ylabel("Return Rate")
-    ax1.set_xlabel("")
-    ax1.tick_params(axis='x', rotation=45, labelsize=12)
-    ax1.tick_params(axis='y', labelsize=12)
-    st.pyplot(fig1)
-    st.markdown("""
-    - **Rugs**, **Tabletop**, and **Lighting** show high return rates.
-    - These categories often suffer from sizing issues or mismatch in expectations.
-    - Consider improved visual merchandising and product filters.
-    """)
+    with diagnostics.timed("EDA 1. Return Rate by Product Category", rows=eda['rows']):
+        st.subheader("1. Return Rate by Product Category")
+        cat_df = (
+            rollup(cube, 'Product_Category')
+            .query("Total_Orders > 100")
+            .sort_values('Return_Rate', ascending=False)
+            .head(10)
+        )
+        def build_category_returns(cat_df):
+            return bar(cat_df, 'Product_Category', 'Return_Rate', "Top 10 Product Categories by Return Rate",
+                       scheme='reds', reverse=True, value_title="Return Rate", label_angle=-45)
+        show_chart('eda_category_returns', cat_df, build_category_returns)
+        st.markdown("""
+        - **Rugs**, **Tabletop**, and **Lighting** show high return rates.
+        - These categories often suffer from sizing issues or mismatch in expectations.
+        - Consider improved visual merchandising and product filters.
+        """)
 
     # 2. Return Rate by Platform and Guarantee
-    st.subheader("2. Return Rate by Platform and Guarantee Visibility")
-    platform_df = df.groupby(['Platform_Name', 'Has_Guarantee'])['Has_Return'].mean().reset_index()
-    platform_df['Guarantee'] = platform_df['Has_Guarantee'].map({0: 'No Guarantee', 1: 'Guarantee Shown'})
-    fig2, ax2 = plt.subplots(figsize=(10, 5))
-    sns.barplot(data=platform_df, x='Platform_Name', y='Has_Return', hue='Guarantee', palette='Set2', ax=ax2)
-    ax2.set_title("Return Rate by Platform and Guarantee", fontsize=16)
-    ax2.set_ylabel("Return Rate")
-    ax2.tick_params(labelsize=12)
-    st.pyplot(fig2)
-    st.markdown("""
-    - Desktop users benefit more from guarantee visibility than mobile users.
-    - Guarantees reduce return rate primarily for high-AOV products.
-    - Suggest platform-specific UI emphasis for guarantees.
-    """)
+    with diagnostics.timed("EDA 2. Return Rate by Platform and Guarantee Visibility", rows=eda['rows']):
+        st.subheader("2. Return Rate by Platform and Guarantee Visibility")
+        platform_df = rollup(cube, ['Platform_Name', 'Has_Guarantee'])
+        platform_df['Guarantee'] = platform_df['Has_Guarantee'].map({0: 'No Guarantee', 1: 'Guarantee Shown'})
+        def build_platform_guarantee(platform_df):
+            return bar(platform_df, 'Platform_Name', 'Return_Rate', "Return Rate by Platform and Guarantee",
+                       color='Guarantee', scheme='set2', value_title="Return Rate")
+        show_chart('eda_platform_guarantee', platform_df, build_platform_guarantee)
+        st.markdown("""
+        - Desktop users benefit more from guarantee visibility than mobile users.
+        - Guarantees reduce return rate primarily for high-AOV products.
+        - Suggest platform-specific UI emphasis for guarantees.
+        """)
 
     # 3. Return Rate by Delivery Status
-    st.subheader("3. Return Rate by Delivery Status")
-    delay_df = df.groupby('Delivery_Status')['Has_Return'].mean().reset_index()
-    fig3, ax3 = plt.subplots(figsize=(8, 5))
-    sns.barplot(data=delay_df, x='Delivery_Status', y='Has_Return', palette='coolwarm', ax=ax3)
-    ax3.set_title("Return Rate by Delivery Status", fontsize=16)
-    ax3.tick_params(labelsize=12)
-    st.pyplot(fig3)
-    st.markdown("""
-    - Late deliveries are associated with higher return rates.
-    - On-time and early deliveries significantly reduce return risks.
-    - Wayfair should optimize SLA performance for large-parcel items.
-    """)
+    with diagnostics.timed("EDA 3. Return Rate by Delivery Status", rows=eda['rows']):
+        st.subheader("3. Return Rate by Delivery Status")
+        delay_df = rollup(cube, 'Delivery_Status')
+        def build_delivery_status(delay_df):
+            return bar(delay_df, 'Delivery_Status', 'Return_Rate', "Return Rate by Delivery Status",
+                       scheme='redblue', reverse=True, value_title="Return Rate")
+        show_chart('eda_delivery_status', delay_df, build_delivery_status)
+        st.markdown("""
+        - Late deliveries are associated with higher return rates.
+        - On-time and early deliveries significantly reduce return risks.
+        - Wayfair should optimize SLA performance for large-parcel items.
+        """)
 
     # 4. Correlation Heatmap
-    st.subheader("4. Correlation of Key Numerical Variables")
-    fig4, ax4 = plt.subplots(figsize=(7, 6))
-    corr = df[['Has_Return', 'Order_Value_Numeric', 'Actual_Delivery_Days', 'Guarantee_Shown']].corr()
-    sns.heatmap(corr, annot=True, cmap='coolwarm', fmt=".2f", ax=ax4)
-    ax4.set_title("Correlation Heatmap", fontsize=16)
-    st.pyplot(fig4)
-    st.markdown("""
-    - Returns positively correlate with delivery delay and slightly with order value.
-    - Guarantees are slightly negatively correlated with returns.
-    - Most variables show small to moderate linear relationships.
-    """)
+    with diagnostics.timed("EDA 4. Correlation of Key Numerical Variables", rows=eda['rows']):
+        st.subheader("4. Correlation of Key Numerical Variables")
+        corr = eda['corr']
+        def build_correlation(corr):
+            return heatmap(corr, "Correlation Heatmap")
+        show_chart('eda_correlation', corr, build_correlation)
+        st.markdown("""
+        - Returns positively correlate with delivery delay and slightly with order value.
+        - Guarantees are slightly negatively correlated with returns.
+        - Most variables show small to moderate linear relationships.
+        """)
 
     # 5. Histogram of Order Value
-    st.subheader("5. Distribution of Order Values")
-    fig5, ax5 = plt.subplots(figsize=(10, 5))
-    sns.histplot(df['Order_Value_Numeric'], bins=50, kde=False, color='steelblue', ax=ax5)
-    ax5.set_title("Histogram of Order Values", fontsize=16)
-    ax5.set_xlabel("Order Value")
-    ax5.set_ylabel("Order Count")
-    ax5.tick_params(labelsize=12)
-    st.pyplot(fig5)
-    st.markdown("""
-    - The majority of orders fall below $200.
-    - A small tail of high-value orders presents higher return risk.
-    - Marketing strategy can focus on retention at mid-to-high order tiers.
-    """)
+    with diagnostics.timed("EDA 5. Distribution of Order Values", rows=eda['rows']):
+        st.subheader("5. Distribution of Order Values")
+        # Pre-binned from the order-value sketch, so the payload is HIST_BINS bars at any data size
+        def build_order_value_hist(hist):
+            hist_counts, hist_edges = hist
+            return histogram(hist_counts, hist_edges, "Histogram of Order Values", "Order Value", "Order Count")
+        show_chart('eda_order_value_hist', eda['hist'], build_order_value_hist)
+        percentiles = eda['percentiles'].dropna()
+        if len(percentiles):
+            st.caption("Order value percentiles: " + " · ".join(f"P{q * 100:g} ${v:,.0f}" for q, v in percentiles.items()))
+        st.markdown("""
+        - The majority of orders fall below $200.
+        - A small tail of high-value orders presents higher return risk.
+        - Marketing strategy can focus on retention at mid-to-high order tiers.
+        """)
 
     # 6. Return Rate by Order Price Range
-    st.subheader("6. Return Rate by Price Range")
-    df['Price_Bin'] = pd.cut(df['Order_Value_Numeric'], bins=[0, 50, 100, 200, 300, 500, 1000])
-    price_return_df = df.groupby('Price_Bin')['Has_Return'].mean().reset_index()
-    fig6, ax6 = plt.subplots(figsize=(10, 5))
-    sns.barplot(data=price_return_df, x='Price_Bin', y='Has_Return', palette='Blues_d', ax=ax6)
-    ax6.set_title("Return Rate by Order Value Range", fontsize=16)
-    ax6.set_xlabel("Price Range")
-    ax6.set_ylabel("Return Rate")
-    ax6.tick_params(labelsize=12)
-    st.pyplot(fig6)
-    st.markdown("""
-    - Orders in the $200–$500 range show the highest return risk.
-    - Guarantees and UI enhancements should be focused in this band.
-    - Budget segments (<$100) present low return concerns.
-    """)
+    with diagnostics.timed("EDA 6. Return Rate by Price Range", rows=eda['rows']):
+        st.subheader("6. Return Rate by Price Range")
+        price_return_df = rollup(cube, 'Price_Bin')
+        def build_price_range(price_return_df):
+            return bar(price_return_df, 'Price_Bin', 'Return_Rate', "Return Rate by Order Value Range",
+                       scheme='blues', category_title="Price Range", value_title="Return Rate")
+        show_chart('eda_price_range', price_return_df, build_price_range)
+        st.markdown("""
+        - Orders in the $200–$500 range show the highest return risk.
+        - Guarantees and UI enhancements should be focused in this band.
+        - Budget segments (<$100) present low return concerns.
+        """)
 
     # 7. K-Means Customer Segments
-    st.subheader("7. Customer Segments from Clustering")
-    segment_df = pd.DataFrame({
-        'Segment': ['Premium Buyers', 'Value Shoppers', 'High-Return Customers', 'Moderate Shoppers'],
-        'Avg_Order_Value': [373.29, 91.38, 137.99, 125.50],
-        'Return_Rate': [0.37, 0.00, 90.04, 25.50],
-        'Customer_Pct': [10, 56, 5, 29]
-    })
-    fig7, ax7 = plt.subplots(figsize=(10, 6))
-    sns.scatterplot(data=segment_df,
-                    x='Avg_Order_Value', y='Return_Rate', size='Customer_Pct',
-                    hue='Segment', sizes=(300, 1500), ax=ax7, legend=False)
-    for _, row in segment_df.iterrows():
-        ax7.text(row['Avg_Order_Value'] + 5, row['Return_Rate'], row['Segment'], fontsize=12)
-    ax7.set_xlabel("Average Order Value")
-    ax7.set_ylabel("Return Rate")
-    ax7.set_title("K-Means Customer Segments", fontsize=16)
-    st.pyplot(fig7)
-    st.markdown("""
-    - Value Shoppers form the largest group (56%) with zero returns.
-    - High-Return Customers (5%) create heavy cost burdens.
-    - UX and education should be tailored by segment.
-    """)
+    with diagnostics.timed("EDA 7. Customer Segments from Clustering", rows=eda['rows']):
+        st.subheader("7. Customer Segments from Clustering")
+        if serving():
+            segment_df = get_bundle(data_version()).segments
+        else:
+            segment_df = None if df is None else get_segment_summary(
+                df, df.attrs.get('fingerprint'), active_filters, filter_rows
+            )
+        if segment_df is not None:
+            def build_segments(segment_df):
+                return scatter(segment_df, 'Avg_Order_Value', 'Return_Rate', 'Customer_Pct', 'Segment',
+                               "K-Means Customer Segments", "Average Order Value", "Return Rate")
+            show_chart('eda_segments', segment_df, build_segments)
+            if df is not None and filter_rows is not None:
+                st.caption("Customers are profiled on their selected orders only, with segments from the model fitted on all orders.")
+            by_segment = segment_df.set_index('Segment')
+            largest = by_segment['Customer_Pct'].idxmax()
+            st.markdown(f"""
+            - {largest} form the largest group ({by_segment.loc[largest, 'Customer_Pct']:.0f}%) with a {by_segment.loc[largest, 'Return_Rate']:.2f}% return rate.
+            - High-Return Customers ({by_segment['Customer_Pct'].get('High-Return Customers', 0):.0f}%) create heavy cost burdens.
+            - UX and education should be tailored by segment.
+            """)
+        elif df is None:
+            st.info("Customer segments need the order file in memory and are not shown in out-of-core mode.")
+        else:
+            st.info("Customer segmentation needs a `Customer_ID` column in the order file.")
 
     # 8. Guarantee vs Return Rate (Simple Comparison)
-    st.subheader("8. Guarantee Visibility and Return Rates")
-    g_df = df.groupby('Has_Guarantee')['Has_Return'].mean().reset_index()
-    g_df['Guarantee'] = g_df['Has_Guarantee'].map({0: 'No Guarantee', 1: 'Guarantee Shown'})
-    fig8, ax8 = plt.subplots(figsize=(6, 4))
-    sns.barplot(data=g_df, x='Guarantee', y='Has_Return', palette='pastel', ax=ax8)
-    ax8.set_title("Guarantee Effect on Return Rate", fontsize=16)
-    ax8.tick_params(labelsize=12)
-    st.pyplot(fig8)
-    st.markdown("""
-    - Guarantees lower the return rate slightly overall.
-    - Their impact is more significant within specific categories and platforms.
-    - Expand guarantees selectively on subjective or high-return SKUs.
-    """)
+    with diagnostics.timed("EDA 8. Guarantee Visibility and Return Rates", rows=eda['rows']):
+        st.subheader("8. Guarantee Visibility and Return Rates")
+        g_df = rollup(cube, 'Has_Guarantee')
+        g_df['Guarantee'] = g_df['Has_Guarantee'].map({0: 'No Guarantee', 1: 'Guarantee Shown'})
+        def build_guarantee(g_df):
+            return bar(g_df, 'Guarantee', 'Return_Rate', "Guarantee Effect on Return Rate",
+                       scheme='pastel1', value_title="Return Rate")
+        show_chart('eda_guarantee', g_df, build_guarantee)
+        st.markdown("""
+        - Guarantees lower the return rate slightly overall.
+        - Their impact is more significant within specific categories and platforms.
+        - Expand guarantees selectively on subjective or high-return SKUs.
+        """)
 
     st.success("Exploratory analysis completed. Use these insights to drive modeling and strategic recommendations.")
 
@@ -234,6 +543,9 @@ def show_eda():
 # Machine Learning Models Section
 # ----------------------------
 def show_ml_models():
+    from charts import bar, show_chart
+    from model import coefficient_findings
+
     st.title("Machine Learning Models")
 
     # Objective
@@ -242,76 +554,166 @@ def show_ml_models():
     This model predicts whether an order will be returned using order-level data, customer segment, guarantee visibility, delivery experience, and product category information.
     """)
 
+    if serving():
+        artifact = get_bundle(data_version()).model
+    else:
+        df = load_data(data_version())
+        artifact = get_return_model(df, df.attrs.get('fingerprint'))
+    metrics = artifact['metrics']
+    report = artifact['report']
+
     # Model Comparison Table
     st.markdown("### Models Performance Summary")
-    st.dataframe(pd.DataFrame({
-        "Model": ["Logistic Regression", "Random Forest", "Gradient Boosting", "XGBoost"],
-        "Accuracy": [0.9741, 0.9765, 0.9762, 0.9756],
-        "AUC": [0.9972, 0.9962, 0.9970, 0.9969]
-    }))
-    st.markdown("""
-    - All models performed well with **AUC > 0.996**, indicating high classification power.  
-    - **Random Forest** and **Gradient Boosting** slightly outperformed others on accuracy.  
+    st.dataframe(metrics.style.format({"Accuracy": "{:.4f}", "AUC": "{:.4f}"}))
+    best_accuracy = metrics.loc[metrics['Accuracy'].idxmax(), 'Model']
+    st.markdown(f"""
+    - All models reach **AUC ≥ {metrics['AUC'].min():.3f}** on a held-out 20% test split ({artifact['test_rows']:,} orders).  
+    - **{best_accuracy}** has the highest accuracy ({metrics['Accuracy'].max():.4f}).  
     - **Logistic Regression** offers strong interpretability and is preferred for actionable insights.
     """)
+    st.caption(f"Trained {artifact['trained_at']} on {artifact['train_rows']:,} orders; retrained only when the data changes.")
 
     # Logistic Regression Class Performance
     st.markdown("### Logistic Regression - Classification Report")
-    st.markdown("""
-    | Class            | Precision | Recall | F1-score |
-    |------------------|-----------|--------|----------|
-    | No Return (0)    | 1.00      | 0.97   | 0.99     |
-    | Return (1)       | 0.69      | 1.00   | 0.82     |
-
-    - Recall for return class is **1.00**, capturing all actual returns.  
-    - The model slightly over-predicts returns, reflected in the 0.69 precision.  
+    st.dataframe(report.set_index('Class').style.format(
+        {"Precision": "{:.2f}", "Recall": "{:.2f}", "F1-score": "{:.2f}", "Support": "{:,}"}
+    ))
+    st.markdown(f"""
+    - Recall for the return class is **{report.loc[1, 'Recall']:.2f}** at a 0.5 threshold.  
+    - Precision for the return class is **{report.loc[1, 'Precision']:.2f}**; class balancing trades some precision for recall.  
     - This tradeoff is acceptable to **minimize unflagged costly returns**.
     """)
 
     # Top Predictive Features
     st.markdown("### Top Predictive Features")
-    feature_df = pd.DataFrame({
-        "Feature": [
-            "Customer_Segment_Value Shoppers",
-            "Customer_Segment_Premium Buyers",
-            "Customer_Return_Rate",
-            "Actual_Delivery_Days",
-            "Order_Value_Numeric"
-        ],
-        "Coefficient": [-2.64, -1.76, 1.32, 1.14, -0.92]
-    })
-
-    fig, ax = plt.subplots(figsize=(8, 5))
-    sns.barplot(data=feature_df, x='Coefficient', y='Feature', palette='coolwarm', ax=ax)
-    ax.set_title("Feature Importance from Logistic Regression", fontsize=16)
-    ax.set_xlabel("Coefficient")
-    ax.tick_params(labelsize=12)
-    st.pyplot(fig)
+    feature_df = artifact['coefficients'].head(8)
 
-    st.markdown("""
-    - **Value Shoppers (-2.64)** and **Premium Buyers (-1.76)** are significantly less likely to return orders.  
-    - **Value Shoppers (56% of users)** and **Premium Buyers (10%)** drive reliable profits with low return rates.  
-    - **High-Return Customers (5%)** create operational costs and should be deprioritized.  
-    - **Customer's past return rate** and **late deliveries** increase return likelihood.  
-    - **Higher order values** slightly decrease return probability.
-   
-    """)
+    def build_feature_importance(feature_df):
+        return bar(feature_df, 'Feature', 'Coefficient', "Feature Importance from Logistic Regression",
+                   scheme='redblue', reverse=True, horizontal=True, value_title="Coefficient", fmt='.2f')
+    show_chart('ml_feature_importance', feature_df, build_feature_importance)
+
+    st.markdown(
+        "- Coefficients are on standardized numeric features and one-hot dummies (first level dropped as the baseline).\n"
+        + coefficient_findings(artifact['coefficients'])
+    )
 
     # Business Strategy
     st.markdown("### Business Strategy Recommendations")
     st.markdown("""
-    1. Focus retention and loyalty efforts on **Premium Buyers**.  
+    1. Focus retention and loyalty efforts on the **segments the model associates with fewer returns**.  
     2. Scale guarantees strategically where returns are high, but loyal segments exist.  
-    3. Prioritize **delivery performance**, particularly for large-parcel goods, to reduce return risk.  
+    3. Prioritize **delivery performance** wherever delivery features drive return risk.  
     4. Deploy **Logistic Regression** for production as it's accurate, interpretable, and stable.  
     5. Pair model predictions with segmentation for **tailored CX strategy** and fraud flagging.
     """)
 
 
+# ----------------------------
+# What-If Simulator Section
+# ----------------------------
+def show_whatif():
+    import time
+    from charts import bar, show_chart
+    from whatif import RETURN_HANDLING_COST, RETURN_VALUE_SHARE, UNSEEN_LEVEL
+
+    st.title("What-If Return Simulator")
+
+    st.markdown("### Objective")
+    st.markdown("""
+    Estimate how expected returns and return costs change under operational scenarios, such as faster delivery
+    or showing guarantees on more orders. Every order is rescored with the logistic regression return predictor.
+    """)
+
+    if serving():
+        st.info("The simulator rescores the full order base, so it needs the order data and is not available when serving from a bundle.")
+        return
+
+    df = load_data(data_version())
+    if not len(df):
+        st.info("There are no orders to simulate.")
+        return
+    whatif = get_whatif(df, df.attrs.get('fingerprint'))
+
+    def options(column):
+        return [level for level in whatif.levels(column) if level not in (UNSEEN_LEVEL, 'Unknown')]
+
+    st.markdown("### Scenario")
+    col1, col2 = st.columns(2)
+    with col1:
+        delivery_shift = st.slider("Change in delivery days", -5, 5, 0,
+                                   help="Negative values mean faster delivery; delivery days are floored at zero.")
+        status = st.selectbox("Set delivery status", ["No change"] + options('Delivery_Status'))
+        guarantee = st.selectbox("Guarantee visibility", ["No change", "Show on all orders", "Hide on all orders"])
+    with col2:
+        segment_from = st.selectbox("Move customers from segment", ["No change"] + options('Customer_Segment'))
+        segment_to = st.selectbox("To segment", options('Customer_Segment'), disabled=segment_from == "No change")
+        scope = st.multiselect("Apply to product categories", options('Product_Category'),
+                               help="Leave empty to apply the scenario to every category.")
+    col3, col4 = st.columns(2)
+    handling_cost = col3.number_input("Handling cost per return ($)", 0.0, 500.0, RETURN_HANDLING_COST, 5.0)
+    value_share = col4.slider("Share of order value lost per return", 0.0, 1.0, RETURN_VALUE_SHARE, 0.05)
+
+    where = {'Product_Category': scope} if scope else None
+    edits = []
+    if delivery_shift:
+        edits.append({'column': 'Actual_Delivery_Days', 'op': 'shift', 'value': delivery_shift, 'where': where})
+    if status != "No change":
+        edits.append({'column': 'Delivery_Status', 'op': 'set', 'value': status, 'where': where})
+    if guarantee != "No change":
+        edits.append({'column': 'Guarantee_Shown', 'op': 'set', 'value': int(guarantee.startswith("Show")), 'where': where})
+    if segment_from not in ("No change", segment_to):
+        edits.append({'column': 'Customer_Segment', 'op': 'set', 'value': segment_to,
+                      'where': {**(where or {}), 'Customer_Segment': [segment_from]}})
+
+    start = time.perf_counter()
+    with diagnostics.timed("What-if rescoring", rows=whatif.rows):
+        result = whatif.simulate(edits, handling_cost, value_share)
+    elapsed = time.perf_counter() - start
+    totals = result.sum(numeric_only=True)
+
+    st.markdown("### Scenario Impact")
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Orders Affected", f"{int(totals['Changed_Orders']):,}")
+    m2.metric("Expected Returns", f"{totals['Scenario_Returns']:,.0f}",
+              f"{totals['Return_Delta']:+,.0f}", delta_color="inverse")
+    m3.metric("Expected Return Rate", f"{totals['Scenario_Returns'] / totals['Orders']:.2%}",
+              f"{totals['Return_Delta'] / totals['Orders'] * 100:+.2f}pp", delta_color="inverse")
+    m4.metric("Expected Return Cost", f"${totals['Scenario_Cost']:,.0f}",
+              f"{totals['Cost_Delta']:+,.0f}", delta_color="inverse")
+    st.caption(f"{whatif.rows:,} orders rescored in {elapsed * 1000:.0f} ms.")
+
+    by_category = result.sort_values('Return_Delta')
+    st.dataframe(by_category.set_index('Product_Category').style.format({
+        'Orders': "{:,}", 'Changed_Orders': "{:,}",
+        'Baseline_Returns': "{:,.1f}", 'Scenario_Returns': "{:,.1f}", 'Return_Delta': "{:+,.1f}",
+        'Baseline_Cost': "${:,.0f}", 'Scenario_Cost': "${:,.0f}", 'Cost_Delta': "{:+,.0f}",
+    }))
+    if edits:
+        def build_category_delta(delta_df):
+            return bar(delta_df, 'Product_Category', 'Return_Delta', "Change in Expected Returns by Category",
+                       scheme='redblue', reverse=True, value_title="Expected returns", fmt=',.1f', label_angle=-45)
+        show_chart('whatif_category_delta', by_category[['Product_Category', 'Return_Delta']], build_category_delta)
+
+    # Explainability: per-input effects, comparable across numeric and one-hot inputs
+    st.markdown("### What Drives Predicted Returns")
+    def build_importance(importance):
+        return bar(importance, 'Feature', 'Mean_Abs_Effect', "Average Effect on the Log-Odds of a Return",
+                   scheme='blues', reverse=True, horizontal=True, value_title="Mean absolute effect", fmt='.2f')
+    show_chart('whatif_importance', whatif.importance, build_importance)
+    st.markdown("""
+    - Each bar is how far an input moves an order's log-odds of return from its average, over all orders.
+    - Unlike raw coefficients, this accounts for how much each input actually varies across the order base.
+    - Scenarios on low-effect inputs move expected returns little, however many orders they touch.
+    """)
+
 # ----------------------------
 # A/B Testing Section
 # ----------------------------
 def show_ab_testing():
+    from ab_testing import findings, total_orders, to_long
+    from charts import bar, show_chart
+
     st.title("A/B Testing: Guarantee Visibility Impact")
 
     st.markdown("### Objective")
@@ -320,92 +722,186 @@ def show_ab_testing():
     platforms, and customer segments using a controlled A/B test framework.
     """)
 
+    if serving():
+        bundle = get_bundle(data_version())
+        sequential = st.checkbox(
+            "Sequential monitoring (always-valid p-values)",
+            help="Use p-values that stay valid under continuous monitoring as new order batches are merged."
+        )
+        ab = bundle.ab(sequential)
+        st.caption(
+            f"{bundle.manifest['ab']['total_orders']:,} orders from {bundle.manifest['ab']['batches']} merged batch(es), "
+            f"served from bundle {bundle.version}"
+        )
+    else:
+        df = load_data(data_version())
+        filter_rows, active_filters = global_filters(df)
+        fingerprint = df.attrs.get('fingerprint')
+        if filter_rows is not None:
+            if not len(filter_rows):
+                st.warning("No orders match the selected filters.")
+                return
+            # Filtered views are fixed snapshots of the selected rows, not a monitored stream
+            sequential = False
+            ab = get_ab_row_results(df, fingerprint, active_filters, filter_rows)
+        else:
+            store = get_ab_store(df, fingerprint, ab_store_version())
+            sequential = st.checkbox(
+                "Sequential monitoring (always-valid p-values)",
+                help="Use p-values that stay valid under continuous monitoring as new order batches are merged."
+            )
+            ab = {
+                'overall': store.results(sequential=sequential),
+                'product': store.results('Product_Category', min_orders=100, sequential=sequential),
+                'platform': store.results('Platform_Name', sequential=sequential),
+                'category_platform': store.results('cell', min_orders=30, sequential=sequential),
+                **get_ab_row_results(df, fingerprint),
+            }
+            st.caption(f"{store.total_orders:,} orders from {len(store.batches)} merged batch(es)")
+    # The store's overall roll-up is a single all-zero row when it holds no orders
+    if not total_orders(ab['overall']):
+        st.info("No orders with guarantee assignments to test yet.")
+        return
+    overall = ab['overall'].iloc[0]
+    delivery = ab['delivery']
+    verdict = (
+        "Statistically significant difference overall" if overall['Significant']
+        else "No statistically significant effect overall"
+    )
+
     st.markdown("### Overall Test Result")
-    st.markdown("""
-    - **Control Group (No Guarantee):** 5.90% return rate  
-    - **Treatment Group (Guarantee):** 5.83% return rate  
-    - **p-value:** 0.63 → No statistically significant effect overall
+    st.markdown(f"""
+    - **Control Group (No Guarantee):** {overall['Control_Return_Rate']:.2%} return rate ({overall['Control_Orders']:,} orders)  
+    - **Treatment Group (Guarantee):** {overall['Treatment_Return_Rate']:.2%} return rate ({overall['Treatment_Orders']:,} orders)  
+    - **Difference:** {overall['Difference'] * 100:+.2f}pp (95% CI {overall['CI_Low'] * 100:+.2f}pp to {overall['CI_High'] * 100:+.2f}pp)  
+    - **p-value:** {overall['P_Value']:.2f} → {verdict}  
+    - **Delivery Status × Returns:** χ² = {delivery['chi2']:,.1f} ({delivery['dof']} dof), p = {delivery['p_value']:.3g}
     """)
 
     # Chart 1: Return Rate by Product Category
-    import pandas as pd
-    import matplotlib.pyplot as plt
-    import seaborn as sns
-
-    product_ab = pd.DataFrame({
-        "Product_Category": ["Bedding", "Lighting", "Rugs", "Tabletop"],
-        "Control_Return_Rate": [0.065, 0.072, 0.110, 0.088],
-        "Treatment_Return_Rate": [0.052, 0.061, 0.111, 0.087]
-    })
-    product_melted = product_ab.melt(id_vars="Product_Category", var_name="Group", value_name="Return Rate")
-    product_melted["Group"] = product_melted["Group"].map({
-        "Control_Return_Rate": "Control",
-        "Treatment_Return_Rate": "Treatment"
-    })
-    fig1, ax1 = plt.subplots(figsize=(8, 5))
-    sns.barplot(data=product_melted, x="Product_Category", y="Return Rate", hue="Group", palette="Set2", ax=ax1)
-    ax1.set_title("Return Rate by Product Category", fontsize=14)
-    st.pyplot(fig1)
+    product_ab = ab['product']
+    product_ab = product_ab.loc[
+        (product_ab['Control_Orders'] + product_ab['Treatment_Orders']).nlargest(10).index
+    ]
+    product_melted = to_long(product_ab, "Product_Category")
+    def build_product_ab(product_melted):
+        return bar(product_melted, "Product_Category", "Return Rate", "Return Rate by Product Category",
+                   color="Group", scheme="set2", value_title="Return Rate", label_angle=-45)
+    show_chart('ab_product', product_melted, build_product_ab)
 
-    st.markdown("""
-    - **Bedding** and **Lighting** categories saw return rate reductions under the treatment group.
-    - **Rugs** and **Tabletop** showed no significant difference between groups.
-    - Guarantees should be expanded in product categories where size/fit perception matters.
-    """)
+    st.markdown(findings(ab['product'], "product category"))
 
     # Chart 2: Return Rate by Platform
-    platform_ab = pd.DataFrame({
-        "Platform": ["Desktop", "Mobile"],
-        "Control_Return_Rate": [0.058, 0.064],
-        "Treatment_Return_Rate": [0.053, 0.065]
-    })
-    platform_melted = platform_ab.melt(id_vars="Platform", var_name="Group", value_name="Return Rate")
-    platform_melted["Group"] = platform_melted["Group"].map({
-        "Control_Return_Rate": "Control",
-        "Treatment_Return_Rate": "Treatment"
-    })
-    fig2, ax2 = plt.subplots(figsize=(6, 5))
-    sns.barplot(data=platform_melted, x="Platform", y="Return Rate", hue="Group", palette="Set1", ax=ax2)
-    ax2.set_title("Return Rate by Platform", fontsize=14)
-    st.pyplot(fig2)
+    platform_melted = to_long(ab['platform'], "Platform")
+    def build_platform_ab(platform_melted):
+        return bar(platform_melted, "Platform", "Return Rate", "Return Rate by Platform",
+                   color="Group", scheme="set1", value_title="Return Rate")
+    show_chart('ab_platform', platform_melted, build_platform_ab)
 
-    st.markdown("""
-    - **Desktop users** benefited most from guarantee visibility with lower return rates.
-    - **Mobile users** showed little to no difference in return behavior.
-    - Mobile UX may not be optimal for viewing or interpreting guarantee information.
-    """)
+    st.markdown(findings(ab['platform'], "platform"))
 
     # Chart 3: Return Rate by Customer Segment
-    segment_ab = pd.DataFrame({
-        "Customer_Segment": ["Premium Buyers", "Value Shoppers", "High-Return Customers", "Moderate Shoppers"],
-        "Control_Return_Rate": [0.005, 0.00, 0.91, 0.26],
-        "Treatment_Return_Rate": [0.004, 0.00, 0.86, 0.22]
-    })
-    segment_melted = segment_ab.melt(id_vars="Customer_Segment", var_name="Group", value_name="Return Rate")
-    segment_melted["Group"] = segment_melted["Group"].map({
-        "Control_Return_Rate": "Control",
-        "Treatment_Return_Rate": "Treatment"
-    })
-    fig3, ax3 = plt.subplots(figsize=(10, 6))
-    sns.barplot(data=segment_melted, y="Customer_Segment", x="Return Rate", hue="Group", palette="coolwarm", ax=ax3)
-    ax3.set_title("Return Rate by Customer Segment", fontsize=14)
-    st.pyplot(fig3)
+    if ab['segment'] is not None:
+        segment_melted = to_long(ab['segment'], "Customer_Segment")
+        def build_segment_ab(segment_melted):
+            return bar(segment_melted, "Customer_Segment", "Return Rate", "Return Rate by Customer Segment",
+                       color="Group", scheme="redblue", reverse=True, horizontal=True, value_title="Return Rate")
+        show_chart('ab_segment', segment_melted, build_segment_ab)
 
-    st.markdown("""
-    - **High-Return Customers** showed a meaningful drop in return rate when guarantees were shown.
-    - **Moderate Shoppers** also returned less in the treatment group.
-    - **Value Shoppers** had no returns in either group — guarantees are not necessary for this segment.
-    """)
+        st.markdown(findings(ab['segment'], "customer segment"))
+    else:
+        st.info("Customer segment results need a `Customer_ID` column in the order file.")
+
+    # Per-slice statistics
+    st.markdown("### Slice-Level Test Statistics")
+    stat_columns = [
+        'Control_Orders', 'Treatment_Orders', 'Control_Return_Rate', 'Treatment_Return_Rate',
+        'Difference', 'CI_Low', 'CI_High', 'Z', 'P_Value', 'Significant',
+    ]
+    with st.expander("Product Category"):
+        st.dataframe(ab['product'][stat_columns])
+    with st.expander("Platform"):
+        st.dataframe(ab['platform'][stat_columns])
+    if ab['segment'] is not None:
+        with st.expander("Customer Segment"):
+            if sequential:
+                st.caption("Segments are derived from row-level history, so these p-values are fixed-horizon.")
+            st.dataframe(ab['segment'][stat_columns])
+    with st.expander("Product Category × Platform"):
+        st.dataframe(ab['category_platform'][stat_columns])
 
     # Summary Recommendations
     st.markdown("### Strategic Recommendations")
-    st.markdown("""
-    - Guarantees should not be universally applied — focus on high-return segments and sensitive product categories.
-    - **Desktop UX** should emphasize guarantees where most effective (e.g., Bedding, Lighting).
+    effective = [
+        results[results['Significant'] & (results['Difference'] < 0)]
+        for results in [ab['product'], ab['platform'], ab['category_platform']]
+    ]
+    effective_slices = sum(len(results) for results in effective)
+    if effective_slices:
+        st.markdown(f"""
+    - Guarantees should not be universally applied — focus on the {effective_slices} slice(s) above where they significantly lower returns.
     - Pair guarantee deployment with **customer return profiling** for optimal ROI.
     """)
+        st.success("Guarantee visibility has a measurable impact when deployed selectively.")
+    else:
+        st.markdown("""
+    - No slice shows a significant reduction in returns, so these results do not support expanding guarantees.
+    - Keep the experiment running (sequential monitoring stays valid as batches arrive) before deciding.
+    """)
+        st.info("No significant guarantee effect has been detected yet.")
+
+# ----------------------------
+# Order Scoring Section
+# ----------------------------
+def show_scoring():
+    import io
+    from scoring import RISK_THRESHOLD, score_file
+
+    st.title("Return-Risk Order Scoring")
+
+    st.markdown("### Objective")
+    st.markdown("""
+    Score a batch of new orders with the logistic regression return predictor. Files are streamed through
+    the model in chunks, so large uploads are scored with bounded memory. The same scoring path is available
+    from the command line: `python scoring.py orders.csv -o scores.parquet --history wayfair_part2.csv`.
+    """)
+
+    uploaded = st.file_uploader("Orders to score (CSV or Parquet)", type=["csv", "parquet"])
+    threshold = st.slider("High-risk threshold", 0.05, 0.95, RISK_THRESHOLD, 0.05)
+    if uploaded is None:
+        st.info("Upload an order file with the same columns as the training data to score it.")
+        return
+
+    if serving():
+        bundle = get_bundle(data_version())
+        artifact, customers = bundle.model, bundle.customers
+    else:
+        df = load_data(data_version())
+        fingerprint = df.attrs.get('fingerprint')
+        artifact = get_return_model(df, fingerprint)
+        customers = get_segmentation(df, fingerprint)[1]
+    output = io.BytesIO()
+    with st.spinner("Scoring orders..."):
+        summary = score_file(
+            artifact, uploaded, output, customers,
+            threshold=threshold, top_k=20,
+        )
+    if not summary['rows']:
+        st.warning("The uploaded file has no orders.")
+        return
 
-    st.success("A/B test shows that guarantee visibility has measurable impact when deployed selectively.")
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Orders Scored", f"{summary['rows']:,}")
+    col2.metric("High-Risk Orders", f"{summary['high_risk'] / summary['rows']:.1%}")
+    col3.metric("Mean Return Risk", f"{summary['mean_risk']:.3f}")
+    col4.metric("Throughput", f"{summary['rows_per_minute'] / 1e6:.1f}M rows/min")
+
+    st.markdown("### Highest-Risk Orders")
+    st.dataframe(summary['top'])
+    st.download_button(
+        "Download all scores (CSV)", output.getvalue(),
+        file_name="order_scores.csv", mime="text/csv",
+    )
 
 def show_summary():
     st.title("Project Summary & Business Strategy")
@@ -421,8 +917,8 @@ def show_summary():
 
     st.markdown("### 1. **Guarantee Visibility Strategy**")
     st.markdown("""
-    - Roll out **guarantee visibility** for high-impact categories like **Bedding** and **Lighting**.
-    - Emphasize guarantees in **desktop platforms**, where it demonstrably lowers returns.
+    - Roll out **guarantee visibility** in the categories where the A/B Testing page shows a significant reduction in returns.
+    - Emphasize guarantees on the **platforms** where the experiment shows they lower returns.
     - Test messaging on mobile platforms before broad deployment, due to mixed results.
     """)
 
@@ -434,16 +930,29 @@ def show_summary():
     """)
 
     st.markdown("### 3. **Customer Segmentation & Retention Plan**")
-    st.markdown("""
-    - **Premium Buyers (10%)**: Focus on loyalty with guarantees and high-tier support.
-    - **Value Shoppers (56%)**: Encourage repeat purchases with volume discounts.
-    - **High-Return Customers (5%)**: Offer education or require order confirmations to prevent losses.
-    - **Moderate Shoppers (29%)**: Convert through delivery accuracy and platform personalization.
+    # This page renders without loading data; the shares are computed only on request
+    shares = {}
+    if st.toggle("Show each segment's share of customers", help="Loads the order data and the fitted segments."):
+        if serving():
+            segment_df = get_bundle(data_version()).segments
+        else:
+            df = load_data(data_version())
+            segment_df = get_segment_summary(df, df.attrs.get('fingerprint'))
+        if segment_df is not None:
+            shares = dict(zip(segment_df['Segment'].astype(str), segment_df['Customer_Pct']))
+
+    def share(segment):
+        return f" ({shares.get(segment, 0):.0f}%)" if shares else ""
+    st.markdown(f"""
+    - **Premium Buyers{share('Premium Buyers')}**: Focus on loyalty with guarantees and high-tier support.
+    - **Value Shoppers{share('Value Shoppers')}**: Encourage repeat purchases with volume discounts.
+    - **High-Return Customers{share('High-Return Customers')}**: Offer education or require order confirmations to prevent losses.
+    - **Moderate Shoppers{share('Moderate Shoppers')}**: Convert through delivery accuracy and platform personalization.
     """)
 
     st.markdown("### 4. **Return Risk Modeling Integration**")
     st.markdown("""
-    - Use the **logistic regression return predictor** (AUC ~ 0.997) to score new orders in real-time.
+    - Use the **logistic regression return predictor** (held-out metrics on the Machine Learning Models page) to score new orders in real-time.
     - Create interventions (messaging, guarantees, delivery checks) based on predicted return risk.
     - Deploy return-risk scores into the customer service backend for proactive assistance.
     """)
@@ -492,19 +1001,69 @@ def show_summary():
     we can better align merchandising, marketing spend, and operational focus.
     """)
 
+# ----------------------------
+# Diagnostics (listed only when DASHBOARD_DIAGNOSTICS is set)
+# ----------------------------
+def show_diagnostics():
+    from charts import figure_cache
+
+    st.title("Diagnostics")
+    log_path = os.environ.get(diagnostics.ENV_LOG)
+    st.markdown(f"""
+    Timings recorded by this server process since it started (last {diagnostics.MAX_RECORDS:,} spans, all sessions).
+    Page spans include the cached helpers and chart blocks they call; memory deltas are process-wide RSS changes.
+    {f"Every span is also appended to `{log_path}` as JSON lines." if log_path else ""}
+    """)
+
+    spans = diagnostics.records()
+    if not spans:
+        st.info("No spans recorded yet. Open another page, then come back.")
+        return
+
+    st.markdown("### By Span")
+    st.dataframe(diagnostics.summarize(spans).style.format({
+        'Total_s': "{:.3f}", 'Mean_s': "{:.3f}", 'P95_s': "{:.3f}", 'Max_s': "{:.3f}",
+        'Mean_Rows': "{:,.0f}", 'Mean_Mem_Delta_MB': "{:+.1f}", 'Hit_Rate': "{:.0%}",
+    }, na_rep="-"))
+    lookups = figure_cache.hits + figure_cache.misses
+    st.caption(
+        f"Chart cache: {len(figure_cache)} payloads, {figure_cache.hits:,} hits / {figure_cache.misses:,} misses"
+        + (f" ({figure_cache.hits / lookups:.0%} hit rate)" if lookups else "")
+    )
+
+    st.markdown("### Recent Spans")
+    import pandas as pd
+    recent = pd.DataFrame(spans[-200:][::-1])
+    recent['ts'] = pd.to_datetime(recent['ts'], unit='s')
+    st.dataframe(recent[['ts', 'page', 'name', 'parent', 'seconds', 'rows', 'cache', 'mem_delta_mb', 'error']])
+
+    col1, col2 = st.columns(2)
+    col1.download_button("Download spans (JSON lines)", diagnostics.to_jsonl(spans),
+                         file_name="diagnostics.jsonl", mime="application/x-ndjson")
+    if col2.button("Clear recorded spans"):
+        diagnostics.clear()
+        st.rerun()
+
 # ----------------------------
 # Route to Selected Page
 # ----------------------------
-if selected_page == "Introduction":
-    show_introduction()
-elif selected_page == "Exploratory Data Analysis":
-    show_eda()
-elif selected_page == "Machine Learning Models":
-    show_ml_models()
-elif selected_page == "A/B Testing Insights":
-    show_ab_testing()
-elif selected_page == "Project Summary":
-    show_summary()
+with diagnostics.timed(selected_page):
+    if selected_page == "Introduction":
+        show_introduction()
+    elif selected_page == "Exploratory Data Analysis":
+        show_eda()
+    elif selected_page == "Machine Learning Models":
+        show_ml_models()
+    elif selected_page == "What-If Simulator":
+        show_whatif()
+    elif selected_page == "A/B Testing Insights":
+        show_ab_testing()
+    elif selected_page == "Order Scoring":
+        show_scoring()
+    elif selected_page == "Project Summary":
+        show_summary()
+    elif selected_page == "Diagnostics":
+        show_diagnostics()
 
 # ----------------------------
 # Footer
@@ -0,0 +1,203 @@
+# benchmark.py
+
+import argparse
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+
+
+# ----------------------------
+# Page Benchmarks
+# ----------------------------
+# Renders the data pages headlessly (streamlit.testing AppTest) against synthetic order
+# files (synthetic.py) of each size in SIZES. Every (size, page) pair runs in a fresh
+# Python process with the derived artifacts (Parquet sidecar, trained models, A/B store)
+# removed, so the first render of the page is cold; the page is then rerun once to time
+# the warm path. charts.show_chart is wrapped to attribute time to each chart: 'render'
+# is the time spent inside show_chart and 'section' the time since the previous chart
+# finished, i.e. the aggregation feeding the chart plus its rendering. Peak RSS is the
+# child process high-water mark.
+#
+# `--save-baseline` stores the results in BASELINE_PATH; later runs are compared with it
+# and a page time, chart section or peak RSS counts as a regression when it exceeds the
+# baseline by more than TOLERANCE and by at least the absolute slack (timer and
+# allocator noise on small numbers). Baselines are machine specific.
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(APP_DIR, "app.py")
+DATA_FILE = "wayfair_part2.csv"
+ASSETS = ["wayfair_logo.png"]
+# Files the app derives from the order data in its working directory
+DERIVED = ["wayfair_part2.parquet", "wayfair_part2.parquet.json", "ab_store.pkl", "models", "data"]
+SIZES = [100_000, 1_000_000, 10_000_000]
+PAGES = [
+    "Exploratory Data Analysis",
+    "Machine Learning Models",
+    "What-If Simulator",
+    "A/B Testing Insights",
+]
+BENCH_DIR = "bench_data"
+BASELINE_PATH = "benchmark_baseline.json"
+TOLERANCE = 0.25
+MIN_REGRESSION_SECONDS = 0.5
+MIN_REGRESSION_MB = 64
+
+_CHILD = """
+import json, resource, sys, time
+from streamlit.testing.v1 import AppTest
+import charts
+app_path, page, timeout = sys.argv[1], sys.argv[2], float(sys.argv[3])
+
+sections = []
+mark = [0.0]
+_show_chart = charts.show_chart
+def show_chart(chart_id, data, draw, theme=None):
+    start = time.perf_counter()
+    _show_chart(chart_id, data, draw, theme)
+    end = time.perf_counter()
+    sections.append({'chart': chart_id, 'render': end - start, 'section': end - mark[0]})
+    mark[0] = end
+charts.show_chart = show_chart
+
+def timed(run):
+    del sections[:]
+    mark[0] = start = time.perf_counter()
+    run()
+    return time.perf_counter() - start, list(sections)
+
+at = AppTest.from_file(app_path, default_timeout=timeout).run()
+cold, cold_charts = timed(lambda: at.sidebar.selectbox[0].set_value(page).run())
+warm, warm_charts = timed(lambda: at.run())
+# ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+RSS_UNITS_PER_MB = 2 ** 20 if sys.platform == 'darwin' else 2 ** 10
+print(json.dumps({
+    'cold': cold,
+    'warm': warm,
+    'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / RSS_UNITS_PER_MB,
+    'charts': {'cold': cold_charts, 'warm': warm_charts},
+    'errors': [e.message for e in at.exception],
+}))
+"""
+
+
+def prepare_workdir(rows, bench_dir=BENCH_DIR):
+    """Working directory holding a ``rows``-order data file (generated once) and the app's assets."""
+    workdir = os.path.join(bench_dir, str(rows))
+    os.makedirs(workdir, exist_ok=True)
+    data_path = os.path.join(workdir, DATA_FILE)
+    if not os.path.exists(data_path):
+        from synthetic import write_orders
+        write_orders(data_path, rows, workers=os.cpu_count())
+    for asset in ASSETS:
+        target = os.path.join(workdir, asset)
+        if not os.path.exists(target):
+            shutil.copy(os.path.join(APP_DIR, asset), target)
+    return workdir
+
+
+def clear_derived(workdir):
+    for name in DERIVED:
+        path = os.path.join(workdir, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+
+def measure_page(page, workdir, app_path=APP_PATH, timeout=3600):
+    """Cold then warm render of one page in a subprocess; returns times, peak RSS, chart sections and errors."""
+    clear_derived(workdir)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [APP_DIR, os.environ.get('PYTHONPATH')])))
+    proc = subprocess.run(
+        [sys.executable, "-c", _CHILD, app_path, page, str(timeout)],
+        capture_output=True, text=True, cwd=workdir, env=env,
+    )
+    if proc.returncode != 0:
+        return {'cold': math.nan, 'warm': math.nan, 'peak_rss_mb': math.nan, 'charts': {'cold': [], 'warm': []},
+                'errors': proc.stderr.strip().splitlines()[-1:]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def run_benchmarks(sizes=SIZES, pages=PAGES, bench_dir=BENCH_DIR):
+    """Results keyed by '<rows>/<page>'."""
+    results = {}
+    for rows in sizes:
+        workdir = prepare_workdir(rows, bench_dir)
+        for page in pages:
+            results[f"{rows}/{page}"] = measure_page(page, workdir)
+    return results
+
+
+def _exceeds(new, old, slack, tolerance):
+    return new > old * (1 + tolerance) and new - old >= slack
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Readable regression messages for every measurement in both ``results`` and ``baseline``."""
+    regressions = []
+    for key, new in results.items():
+        old = baseline.get(key)
+        if old is None:
+            continue
+        for metric in ['cold', 'warm']:
+            if _exceeds(new[metric], old[metric], MIN_REGRESSION_SECONDS, tolerance):
+                regressions.append(f"{key}: {metric} {new[metric]:.2f}s vs baseline {old[metric]:.2f}s")
+        if _exceeds(new['peak_rss_mb'], old['peak_rss_mb'], MIN_REGRESSION_MB, tolerance):
+            regressions.append(f"{key}: peak RSS {new['peak_rss_mb']:.0f} MB vs baseline {old['peak_rss_mb']:.0f} MB")
+        old_sections = {c['chart']: c['section'] for c in old['charts']['cold']}
+        for chart in new['charts']['cold']:
+            before = old_sections.get(chart['chart'])
+            if before is not None and _exceeds(chart['section'], before, MIN_REGRESSION_SECONDS, tolerance):
+                regressions.append(f"{key}: chart {chart['chart']} {chart['section']:.2f}s vs baseline {before:.2f}s")
+    return regressions
+
+
+def print_report(results, baseline=None):
+    baseline = baseline or {}
+    for key, row in results.items():
+        old = baseline.get(key)
+        versus = f"  (baseline cold {old['cold']:.2f}s, warm {old['warm']:.2f}s)" if old else ""
+        print(f"{key:<40} cold {row['cold']:7.2f}s  warm {row['warm']:6.2f}s  peak RSS {row['peak_rss_mb']:7.0f} MB{versus}")
+        for chart in row['charts']['cold']:
+            print(f"    {chart['chart']:<34} section {chart['section']:6.2f}s  render {chart['render']:5.2f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard's data pages on synthetic order files.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help="order counts to benchmark")
+    parser.add_argument('--pages', nargs='+', default=PAGES, help="pages to benchmark")
+    parser.add_argument('--bench-dir', default=BENCH_DIR, help="where synthetic data files are generated and kept")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="baseline results file")
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help="allowed relative slowdown")
+    parser.add_argument('--json', dest='json_path', help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.pages, args.bench_dir)
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+    print_report(results, baseline)
+
+    failures = [f"{key}: {row['errors'][0]}" for key, row in results.items() if row['errors']]
+    if not args.save_baseline:
+        failures += compare(results, baseline, args.tolerance)
+    for failure in failures:
+        print(f"FAIL {failure}")
+
+    if args.json_path:
+        with open(args.json_path, 'w') as fh:
+            json.dump(results, fh, indent=2)
+    if args.save_baseline:
+        # Keep entries for sizes and pages not measured in this run
+        with open(args.baseline, 'w') as fh:
+            json.dump({**baseline, **results}, fh, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
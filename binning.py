@@ -0,0 +1,31 @@
+# binning.py
+
+import numpy as np
+import pandas as pd
+
+
+# ----------------------------
+# Vectorized Value Binning
+# ----------------------------
+# Bins are right-closed like pd.cut: edges [0, 50, 100] give (0, 50] and (50, 100].
+# Values outside the edges (or NaN) get code -1, which pandas treats as missing.
+PRICE_EDGES = (0, 50, 100, 200, 300, 500, 1000)
+
+
+def bin_codes(values, edges=PRICE_EDGES):
+    """Return the bin index of every value as a compact integer array."""
+    values = np.asarray(values)
+    edges = np.asarray(edges, dtype=np.float64)
+    codes = np.searchsorted(edges, values, side='left') - 1
+    codes[(codes < 0) | (codes >= len(edges) - 1)] = -1
+    dtype = np.int8 if len(edges) <= 128 else np.int32
+    return codes.astype(dtype, copy=False)
+
+
+def bin_labels(edges=PRICE_EDGES):
+    return pd.IntervalIndex.from_breaks(list(edges), closed='right')
+
+
+def as_categorical(codes, edges=PRICE_EDGES):
+    """Wrap precomputed codes as a Categorical without copying them."""
+    return pd.Categorical.from_codes(codes, categories=bin_labels(edges))
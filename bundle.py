@@ -0,0 +1,335 @@
+# bundle.py
+
+import argparse
+import json
+import os
+import shutil
+import threading
+from datetime import datetime, timezone
+
+
+# ----------------------------
+# Serving Bundle
+# ----------------------------
+# `python bundle.py build wayfair_part2.csv` reads the order file once and writes
+# everything the data pages show into a versioned directory under BUNDLE_ROOT. The
+# bundle holds:
+#
+#   manifest.json   format version, data fingerprint, source, build time and the small
+#                   values (histogram, percentiles, A/B totals, chi-square test)
+#   tables/*.arrow  EDA cube, correlation matrix, segment summary, customer history and
+#                   A/B results (fixed-horizon and sequential), as Arrow IPC files
+#   model.joblib    return-risk model artifact (pipeline, metrics, report, coefficients)
+#   charts/*.json   pre-built Vega-Lite chart payloads (with --charts), seeded into the chart cache
+#
+# Every build gets its own version directory (data fingerprint plus build time). The build
+# writes into a temporary directory, renames it into place, then atomically replaces the
+# CURRENT pointer, so a replica never sees a half-written bundle and a rebuild of the
+# same data never touches the live one. Older versions are then removed, keeping the
+# newest KEEP_VERSIONS so replicas still reading the previous bundle are not cut off.
+#
+# With DASHBOARD_BUNDLE set to BUNDLE_ROOT (or to one version directory), app.py serves
+# the data pages read-only from the bundle and never reads order data or runs a groupby.
+# Tables are memory-mapped and read only when a page asks for them. The model arrays are
+# memory-mapped by joblib. Only the standard library is imported at module level, so
+# app.py can resolve the bundle version cheaply.
+BUNDLE_ROOT = "bundle"
+BUNDLE_VERSION = 1
+BUNDLE_ENV = "DASHBOARD_BUNDLE"
+POINTER_NAME = "CURRENT"
+MANIFEST_NAME = "manifest.json"
+KEEP_VERSIONS = 2
+AB_LEVELS = {
+    'overall': (None, 0),
+    'product': ('Product_Category', 100),
+    'platform': ('Platform_Name', 0),
+    'category_platform': ('cell', 30),
+}
+CHART_PAGES = ["Exploratory Data Analysis", "Machine Learning Models", "A/B Testing Insights"]
+
+
+def resolve(path):
+    """Version directory for ``path``: itself when it holds a manifest, else the one CURRENT names."""
+    if os.path.exists(os.path.join(path, MANIFEST_NAME)):
+        return path
+    pointer = os.path.join(path, POINTER_NAME)
+    if not os.path.exists(pointer):
+        raise FileNotFoundError(f"No artifact bundle at {path} (run `python bundle.py build`)")
+    with open(pointer) as fh:
+        return os.path.join(path, fh.read().strip())
+
+
+def manifest_path(path):
+    return os.path.join(resolve(path), MANIFEST_NAME)
+
+
+# Arrow has no faithful round trip for interval categoricals (the price bands), so such a
+# column is stored as its category codes with the interval breaks in the schema metadata
+_INTERVALS_KEY = b'bundle.intervals'
+
+
+def _write_table(directory, name, df):
+    import pandas as pd
+    import pyarrow as pa
+    intervals = {}
+    for column in df.columns:
+        dtype = df[column].dtype
+        if isinstance(dtype, pd.CategoricalDtype) and isinstance(dtype.categories, pd.IntervalIndex):
+            categories = dtype.categories
+            intervals[column] = {
+                'breaks': categories.left[:1].tolist() + categories.right.tolist(),
+                'closed': categories.closed,
+            }
+            df = df.assign(**{column: df[column].cat.codes})
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    if intervals:
+        table = table.replace_schema_metadata({**table.schema.metadata, _INTERVALS_KEY: json.dumps(intervals)})
+    with pa.OSFile(os.path.join(directory, 'tables', name + '.arrow'), 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return name
+
+
+class Bundle:
+    def __init__(self, path):
+        self.path = resolve(path)
+        with open(os.path.join(self.path, MANIFEST_NAME)) as fh:
+            self.manifest = json.load(fh)
+        if self.manifest.get('format') != BUNDLE_VERSION:
+            raise ValueError(f"{self.path}: bundle format {self.manifest.get('format')}, expected {BUNDLE_VERSION}")
+        self._tables = {}
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        return os.path.basename(os.path.normpath(self.path))
+
+    @property
+    def rows(self):
+        return self.manifest['rows']
+
+    def table(self, name):
+        """Table ``name`` as a DataFrame (None when the bundle has none), read through a memory map."""
+        if name not in self.manifest['tables']:
+            return None
+        with self._lock:
+            if name not in self._tables:
+                import pyarrow as pa
+                source = pa.memory_map(os.path.join(self.path, 'tables', name + '.arrow'))
+                table = pa.ipc.open_file(source).read_all()
+                df = table.to_pandas()
+                intervals = json.loads((table.schema.metadata or {}).get(_INTERVALS_KEY, b'{}'))
+                if intervals:
+                    import pandas as pd
+                    for column, spec in intervals.items():
+                        categories = pd.IntervalIndex.from_breaks(spec['breaks'], closed=spec['closed'])
+                        df[column] = pd.Categorical.from_codes(df[column].to_numpy(), categories=categories)
+                self._tables[name] = df
+            return self._tables[name]
+
+    def eda(self):
+        """Same layout as aggregates.build_eda_cube()."""
+        import numpy as np
+        import pandas as pd
+        values = self.manifest['eda']
+        return {
+            'rows': self.rows,
+            'cube': self.table('eda_cube'),
+            'corr': self.table('eda_corr'),
+            'hist': (np.asarray(values['hist_counts'], dtype=np.int64), np.asarray(values['hist_edges'])),
+            'percentiles': pd.Series(dict(values['percentiles']), dtype=np.float64),
+        }
+
+    @property
+    def segments(self):
+        return self.table('segments')
+
+    @property
+    def customers(self):
+        return self.table('customers')
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                import joblib
+                self._model = joblib.load(os.path.join(self.path, self.manifest['model']), mmap_mode='r')
+            return self._model
+
+    def ab(self, sequential=False):
+        """A/B results as the A/B page builds them from the store and the row-level slices."""
+        suffix = '_sequential' if sequential else ''
+        results = {key: self.table(f"ab_{key}{suffix}") for key in AB_LEVELS}
+        results['segment'] = self.table('ab_segment')
+        results['delivery'] = self.manifest['ab']['delivery']
+        return results
+
+    def seed_figure_cache(self, cache):
+        """Put the pre-built chart payloads into a charts.FigureCache."""
+        for chart in self.manifest.get('charts', []):
+            with open(os.path.join(self.path, 'charts', chart['file']), 'rb') as fh:
+                cache.put(tuple(chart['key']), fh.read())
+
+
+# ----------------------------
+# Offline Build
+# ----------------------------
+def _render_charts(directory):
+    """Render every data page headlessly against the bundle and store the chart cache."""
+    from streamlit.testing.v1 import AppTest
+    import charts
+
+    app_dir = os.path.dirname(os.path.abspath(__file__))
+    previous_env, previous_cwd = os.environ.get(BUNDLE_ENV), os.getcwd()
+    os.environ[BUNDLE_ENV] = os.path.abspath(directory)
+    charts.figure_cache.clear()
+    try:
+        # The app reads its assets relative to its own directory
+        os.chdir(app_dir)
+        at = AppTest.from_file(os.path.join(app_dir, "app.py"), default_timeout=600).run()
+        for page in CHART_PAGES:
+            at.sidebar.selectbox[0].set_value(page).run()
+            if at.exception:
+                raise RuntimeError(f"{page}: {at.exception[0].message}")
+    finally:
+        os.chdir(previous_cwd)
+        if previous_env is None:
+            os.environ.pop(BUNDLE_ENV, None)
+        else:
+            os.environ[BUNDLE_ENV] = previous_env
+
+    os.makedirs(os.path.join(directory, 'charts'), exist_ok=True)
+    entries = []
+    for i, (key, payload) in enumerate(charts.figure_cache.items()):
+        name = f"{i:03d}-{key[0]}.json"
+        with open(os.path.join(directory, 'charts', name), 'wb') as fh:
+            fh.write(payload)
+        entries.append({'key': list(key), 'file': name})
+    return entries
+
+
+def _remove_old_versions(root, current, keep=KEEP_VERSIONS):
+    """Delete all but the newest ``keep`` version directories (never ``current``), and abandoned builds."""
+    prefix = f"v{BUNDLE_VERSION}-"
+    versions, abandoned = [], []
+    for entry in os.scandir(root):
+        if not entry.is_dir() or not entry.name.startswith(prefix) or entry.name == current:
+            continue
+        (abandoned if entry.name.endswith('.tmp') else versions).append(entry.name)
+    # Names lead with the fingerprint rather than the build time, so order by modification time
+    versions.sort(key=lambda name: os.path.getmtime(os.path.join(root, name)), reverse=True)
+    for name in versions[max(keep - 1, 0):] + abandoned:
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+def build_bundle(source, root=BUNDLE_ROOT, ab_store_path=None, render_charts=False):
+    """Build a bundle from the order CSV ``source`` under ``root``; returns its directory."""
+    from ab_store import DATASET_SOURCE, ABStatsStore
+    from ab_testing import analyze, chi_square_independence
+    from aggregates import build_eda_cube
+    from ingest import load_orders
+    from model import load_or_train
+    from segmentation import fit_segments, order_segments, segment_summary
+
+    df = load_orders(source)
+    fingerprint = df.attrs['fingerprint']
+    built_at = datetime.now(timezone.utc)
+    name = f"v{BUNDLE_VERSION}-{fingerprint}-{built_at.strftime('%Y%m%dT%H%M%S%f')}"
+    final = os.path.join(root, name)
+    tmp = final + '.tmp'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(os.path.join(tmp, 'tables'))
+
+    tables = []
+    eda = build_eda_cube(df)
+    tables.append(_write_table(tmp, 'eda_cube', eda['cube']))
+    tables.append(_write_table(tmp, 'eda_corr', eda['corr']))
+
+    segmenter, customers = fit_segments(df) if 'Customer_ID' in df.columns else (None, None)
+    if customers is not None:
+        tables.append(_write_table(tmp, 'segments', segment_summary(customers)))
+        tables.append(_write_table(tmp, 'customers', customers))
+
+    artifact = load_or_train(df, fingerprint, segmenter)
+    import joblib
+    joblib.dump(artifact, os.path.join(tmp, 'model.joblib'))
+
+    # Same A/B inputs as the dashboard: the persisted store (if any) with this file as its
+    # dataset, replacing whatever version of the data the store was last synced with
+    store = ABStatsStore.load(ab_store_path) if ab_store_path else ABStatsStore()
+    store.sync(DATASET_SOURCE, {fingerprint: lambda: df})
+    for key, (level, min_orders) in AB_LEVELS.items():
+        tables.append(_write_table(tmp, f"ab_{key}", store.results(level, min_orders=min_orders)))
+        tables.append(_write_table(tmp, f"ab_{key}_sequential", store.results(level, min_orders=min_orders, sequential=True)))
+    segments = order_segments(df, customers) if customers is not None else None
+    if segments is not None:
+        tables.append(_write_table(tmp, 'ab_segment', analyze(df, segments)))
+    delivery = chi_square_independence(df, 'Delivery_Status')
+
+    manifest = {
+        'format': BUNDLE_VERSION,
+        'fingerprint': fingerprint,
+        'source': os.path.abspath(source),
+        'built_at': built_at.isoformat(timespec='seconds'),
+        'rows': len(df),
+        'tables': tables,
+        'model': 'model.joblib',
+        'eda': {
+            'hist_counts': [int(c) for c in eda['hist'][0]],
+            'hist_edges': [float(e) for e in eda['hist'][1]],
+            'percentiles': [[float(q), float(v)] for q, v in eda['percentiles'].items()],
+        },
+        'ab': {
+            'total_orders': int(store.total_orders),
+            'batches': len(store.batches),
+            'delivery': {
+                'chi2': float(delivery['chi2']),
+                'p_value': float(delivery['p_value']),
+                'dof': int(delivery['dof']),
+            },
+        },
+        'charts': [],
+    }
+
+    def write_manifest():
+        with open(os.path.join(tmp, MANIFEST_NAME), 'w') as fh:
+            json.dump(manifest, fh, indent=2)
+
+    write_manifest()
+    if render_charts:
+        manifest['charts'] = _render_charts(tmp)
+        write_manifest()
+
+    os.replace(tmp, final)
+    pointer = os.path.join(root, POINTER_NAME)
+    with open(pointer + '.tmp', 'w') as fh:
+        fh.write(name)
+    os.replace(pointer + '.tmp', pointer)
+    _remove_old_versions(root, name)
+    return final
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or inspect the read-only serving bundle.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help="build a bundle from an order CSV and make it current")
+    build.add_argument('orders', help="order CSV (e.g. wayfair_part2.csv)")
+    build.add_argument('--root', default=BUNDLE_ROOT)
+    build.add_argument('--ab-store', default=None, help="A/B store to start from (default: this file only)")
+    build.add_argument('--charts', action='store_true', help="also pre-build the chart payloads")
+    show = sub.add_parser('show', help="describe the current bundle")
+    show.add_argument('--root', default=BUNDLE_ROOT)
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        path = build_bundle(args.orders, args.root, args.ab_store, args.charts)
+        print(f"Bundle written to {path} and made current")
+    bundle = Bundle(args.root)
+    m = bundle.manifest
+    print(f"{bundle.version}: {m['rows']:,} orders from {m['source']}, built {m['built_at']}")
+    print(f"  {len(m['tables'])} tables, {len(m['charts'])} pre-built charts")
+
+
+if __name__ == "__main__":
+    main()
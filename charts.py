@@ -0,0 +1,258 @@
+# charts.py
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import diagnostics
+
+
+# ----------------------------
+# Client-Side Charts
+# ----------------------------
+# Charts are Vega-Lite specs drawn in the browser by st.vega_lite_chart, so the server
+# never rasterizes a figure. A chart's build function turns its aggregate (never row-level
+# data) into a spec with the data inlined. The spec is serialized once per (chart id,
+# input data, theme) and kept as JSON bytes in a process-wide LRU, so a repeat view is a
+# dictionary lookup. The payload a rerun ships is a few kilobytes however many orders sit
+# behind the chart: inline data is capped at MAX_POINTS rows per chart (records() thins
+# larger frames evenly), and series such as the order-value histogram arrive pre-binned.
+THEME = {
+    'height': 380,
+    'font_size': 12,
+    'title_size': 16,
+}
+MAX_POINTS = 5000
+PAYLOAD_FORMAT = 'vega-lite'
+
+
+def data_key(obj):
+    """Stable content hash for the small aggregates that feed a chart."""
+    digest = hashlib.blake2b(digest_size=16)
+
+    def feed(o):
+        if isinstance(o, pd.DataFrame):
+            digest.update(repr(list(o.columns)).encode())
+            digest.update(pd.util.hash_pandas_object(o, index=True).to_numpy().tobytes())
+        elif isinstance(o, pd.Series):
+            digest.update(repr(o.name).encode())
+            digest.update(pd.util.hash_pandas_object(o, index=True).to_numpy().tobytes())
+        elif isinstance(o, np.ndarray):
+            digest.update(repr((o.dtype.str, o.shape)).encode())
+            digest.update(np.ascontiguousarray(o).tobytes())
+        elif isinstance(o, (list, tuple)):
+            digest.update(b'(')
+            for item in o:
+                feed(item)
+            digest.update(b')')
+        elif isinstance(o, dict):
+            for k in sorted(o):
+                digest.update(repr(k).encode())
+                feed(o[k])
+        else:
+            digest.update(repr(o).encode())
+
+    feed(obj)
+    return digest.hexdigest()
+
+
+class FigureCache:
+    def __init__(self, max_entries=128, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            if key in self._items:
+                self._size -= len(self._items.pop(key))
+            self._items[key] = value
+            self._size += len(value)
+            while self._items and (len(self._items) > self.max_entries or self._size > self.max_bytes):
+                _, evicted = self._items.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+
+    def items(self):
+        """Snapshot of the cached (key, serialized Vega-Lite spec) pairs, least recently used first."""
+        with self._lock:
+            return list(self._items.items())
+
+    def __len__(self):
+        return len(self._items)
+
+
+figure_cache = FigureCache()
+
+
+def records(df, max_points=MAX_POINTS):
+    """JSON-ready rows of ``df`` for an inline Vega-Lite dataset, thinned evenly to ``max_points``."""
+    if len(df) > max_points:
+        df = df.iloc[np.unique(np.linspace(0, len(df) - 1, max_points).round().astype(np.int64))]
+    # Categories (e.g. price-band intervals) are sent as their labels
+    df = df.assign(**{
+        column: df[column].astype(str)
+        for column in df.columns if isinstance(df[column].dtype, pd.CategoricalDtype)
+    })
+    return json.loads(df.to_json(orient='records'))
+
+
+def bar(df, category, value, title, color=None, scheme='tableau10', reverse=False, horizontal=False,
+        category_title=None, value_title=None, fmt='.1%', label_angle=0):
+    """
+    Bar chart of ``value`` per ``category``, in the row order of ``df``.
+
+    Bars are coloured by category from ``scheme``; with ``color`` they are grouped side by
+    side by that column instead, with a legend. ``horizontal`` lists the categories down y.
+    """
+    cat_channel, value_channel = ('y', 'x') if horizontal else ('x', 'y')
+    encoding = {
+        cat_channel: {'field': category, 'type': 'nominal', 'sort': None, 'title': category_title,
+                      'axis': {'labelAngle': label_angle, 'labelLimit': 260}},
+        value_channel: {'field': value, 'type': 'quantitative', 'title': value_title, 'axis': {'format': fmt}},
+        'color': {
+            'field': color or category, 'type': 'nominal', 'sort': None,
+            'scale': {'scheme': scheme, 'reverse': reverse}, 'legend': {'title': None} if color else None,
+        },
+        'tooltip': [{'field': category, 'type': 'nominal'}, {'field': value, 'type': 'quantitative', 'format': fmt}]
+                   + ([{'field': color, 'type': 'nominal'}] if color else []),
+    }
+    if color:
+        encoding[cat_channel + 'Offset'] = {'field': color, 'type': 'nominal', 'sort': None}
+    columns = [category, value] + ([color] if color else [])
+    return {'title': title, 'data': {'values': records(df[columns])}, 'mark': 'bar', 'encoding': encoding}
+
+
+def histogram(counts, edges, title, x_title, y_title, color='steelblue'):
+    """Pre-binned histogram: one bar per (edges[i], edges[i + 1]] with height counts[i]."""
+    df = pd.DataFrame({'Start': edges[:-1], 'End': edges[1:], 'Count': counts})
+    return {
+        'title': title,
+        'data': {'values': records(df)},
+        'mark': {'type': 'bar', 'color': color},
+        'encoding': {
+            'x': {'field': 'Start', 'type': 'quantitative', 'bin': 'binned', 'title': x_title},
+            'x2': {'field': 'End'},
+            'y': {'field': 'Count', 'type': 'quantitative', 'title': y_title},
+            'tooltip': [
+                {'field': 'Start', 'type': 'quantitative', 'format': ',.0f'},
+                {'field': 'End', 'type': 'quantitative', 'format': ',.0f'},
+                {'field': 'Count', 'type': 'quantitative', 'format': ','},
+            ],
+        },
+    }
+
+
+def heatmap(matrix, title, scheme='redblue', domain=(-1, 1)):
+    """Annotated heatmap of a square frame (e.g. a correlation matrix)."""
+    # Built directly rather than with stack(), whose NaN handling differs across pandas versions
+    rows, order = [str(r) for r in matrix.index], [str(c) for c in matrix.columns]
+    long = pd.DataFrame({
+        'Row': np.repeat(rows, len(order)),
+        'Column': np.tile(order, len(rows)),
+        'Value': matrix.to_numpy(dtype=np.float64).ravel(),
+    })
+    encoding = {
+        'x': {'field': 'Column', 'type': 'nominal', 'sort': order, 'title': None, 'axis': {'labelAngle': -45}},
+        'y': {'field': 'Row', 'type': 'nominal', 'sort': order, 'title': None},
+    }
+    return {
+        'title': title,
+        'data': {'values': records(long)},
+        'encoding': encoding,
+        'layer': [
+            {'mark': 'rect', 'encoding': {
+                'color': {'field': 'Value', 'type': 'quantitative',
+                          'scale': {'scheme': scheme, 'domain': list(domain), 'reverse': True}, 'title': None},
+                'tooltip': [{'field': 'Row'}, {'field': 'Column'},
+                            {'field': 'Value', 'type': 'quantitative', 'format': '.2f'}],
+            }},
+            {'mark': {'type': 'text', 'fontSize': 12}, 'encoding': {
+                'text': {'field': 'Value', 'type': 'quantitative', 'format': '.2f'},
+            }},
+        ],
+    }
+
+
+def scatter(df, x, y, size, label, title, x_title=None, y_title=None):
+    """Labelled bubble chart: one point per row of ``df``, coloured and labelled by ``label``."""
+    encoding = {
+        'x': {'field': x, 'type': 'quantitative', 'title': x_title, 'scale': {'zero': False}},
+        'y': {'field': y, 'type': 'quantitative', 'title': y_title, 'scale': {'zero': False}},
+    }
+    return {
+        'title': title,
+        'data': {'values': records(df[[label, x, y, size]])},
+        'encoding': encoding,
+        'layer': [
+            {'mark': {'type': 'circle', 'opacity': 0.8}, 'encoding': {
+                'size': {'field': size, 'type': 'quantitative', 'scale': {'range': [300, 1500]}, 'legend': None},
+                'color': {'field': label, 'type': 'nominal', 'legend': None},
+                'tooltip': [{'field': label, 'type': 'nominal'}]
+                           + [{'field': c, 'type': 'quantitative', 'format': ',.2f'} for c in (x, y, size)],
+            }},
+            {'mark': {'type': 'text', 'align': 'left', 'dx': 25, 'fontSize': 12},
+             'encoding': {'text': {'field': label, 'type': 'nominal'}}},
+        ],
+    }
+
+
+def render_chart(chart_id, data, build, theme=None):
+    """
+    Return the serialized Vega-Lite spec for ``build(data)``, building it only on a cache miss.
+
+    ``build`` must derive its spec purely from ``data``; the theme is applied here.
+    """
+    theme = theme or THEME
+    key = (chart_id, data_key(data), data_key(theme), PAYLOAD_FORMAT)
+    with diagnostics.timed(f"render {chart_id}", cached=True):
+        payload = figure_cache.get(key)
+        if payload is not None:
+            return payload
+
+        diagnostics.cache_miss()
+        spec = {
+            '$schema': 'https://vega.github.io/schema/vega-lite/v5.json',
+            'height': theme['height'],
+            **build(data),
+            'config': {
+                'axis': {'labelFontSize': theme['font_size'], 'titleFontSize': theme['font_size']},
+                'legend': {'labelFontSize': theme['font_size']},
+                'title': {'fontSize': theme['title_size']},
+            },
+        }
+        payload = json.dumps(spec, separators=(',', ':')).encode()
+        figure_cache.put(key, payload)
+        return payload
+
+
+def show_chart(chart_id, data, build, theme=None):
+    """Draw the chart in the browser from its cached Vega-Lite payload."""
+    # The span around st.vega_lite_chart adds the cost of handing the spec to Streamlit.
+    # Each call gets a fresh dict, since Streamlit may rewrite the spec it is given.
+    with diagnostics.timed(f"chart {chart_id}"):
+        payload = render_chart(chart_id, data, build, theme)
+        st.vega_lite_chart(spec=json.loads(payload), use_container_width=True)
@@ -0,0 +1,185 @@
+# diagnostics.py
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+
+# ----------------------------
+# Hot-Path Instrumentation
+# ----------------------------
+# Opt-in with DASHBOARD_DIAGNOSTICS=1, or with DASHBOARD_DIAGNOSTICS_LOG=<path>, which also
+# appends every record to that file as JSON lines. Spans wrap page functions, data
+# loading, the cached helpers, the EDA chart blocks and chart rendering. Each span records
+# wall time, rows processed, the change in process RSS and, for spans around a cached
+# call, whether the cache hit. The cached function body calls cache_miss(), so a span
+# whose body never ran was served from cache.
+#
+# Spans nest per thread, and Streamlit runs each session's script in its own thread. A
+# record therefore names its parent span and the page it ran under. The RSS delta is
+# process-wide, so concurrent sessions blur it. Records are kept in a bounded in-process
+# buffer for the Diagnostics page. When diagnostics are off, every hook is an environment
+# lookup. This module only imports the standard library, so the text pages stay light.
+ENV_FLAG = "DASHBOARD_DIAGNOSTICS"
+ENV_LOG = "DASHBOARD_DIAGNOSTICS_LOG"
+MAX_RECORDS = 5000
+
+_records = deque(maxlen=MAX_RECORDS)
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def enabled():
+    return os.environ.get(ENV_FLAG, '').lower() in ('1', 'true', 'yes') or bool(os.environ.get(ENV_LOG))
+
+
+def rss_bytes():
+    """Current resident set size of this process (None where /proc is unavailable)."""
+    try:
+        with open('/proc/self/statm') as fh:
+            return int(fh.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def _session_id():
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx(suppress_warning=True)
+    except Exception:
+        return None
+    return ctx.session_id if ctx is not None else None
+
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+class timed:
+    """
+    Context manager or decorator that records one span named ``name``.
+
+    As a context manager it yields the span dict, so a block can set ``span['rows']``.
+    As a decorator ``rows`` may be a callable applied to the return value. With
+    ``cached=True`` the span counts as a cache hit unless cache_miss() runs inside it.
+    """
+
+    def __init__(self, name, rows=None, cached=False):
+        self.name = name
+        self.rows = rows
+        self.cached = cached
+
+    def __enter__(self):
+        if not enabled():
+            return {}
+        stack = _stack()
+        span = {
+            'ts': time.time(),
+            'session': _session_id(),
+            'page': stack[0]['page'] if stack else self.name,
+            'name': self.name,
+            'parent': stack[-1]['name'] if stack else None,
+            'rows': None if callable(self.rows) else self.rows,
+            'cache': 'hit' if self.cached else None,
+            '_start': time.perf_counter(),
+            '_rss': rss_bytes(),
+        }
+        stack.append(span)
+        return span
+
+    def __exit__(self, exc_type, exc, tb):
+        stack = _stack()
+        if not enabled() or not stack or '_start' not in stack[-1]:
+            return False
+        span = stack.pop()
+        span['seconds'] = time.perf_counter() - span.pop('_start')
+        before, after = span.pop('_rss'), rss_bytes()
+        span['mem_delta_mb'] = None if before is None or after is None else (after - before) / 1024 ** 2
+        span['error'] = exc_type.__name__ if exc_type is not None else None
+        record(span)
+        return False
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled():
+                return func(*args, **kwargs)
+            with self as span:
+                result = func(*args, **kwargs)
+                if callable(self.rows):
+                    try:
+                        span['rows'] = int(self.rows(result))
+                    except (TypeError, ValueError, KeyError):
+                        pass
+                return result
+        return wrapper
+
+
+def cache_miss():
+    """Call first thing in a cached function body: marks the enclosing cached span as a miss."""
+    if not enabled():
+        return
+    for span in reversed(_stack()):
+        if span['cache'] is not None:
+            span['cache'] = 'miss'
+            return
+
+
+def record(span):
+    with _lock:
+        _records.append(span)
+        path = os.environ.get(ENV_LOG)
+        if path:
+            try:
+                with open(path, 'a') as fh:
+                    fh.write(json.dumps(span, default=str) + '\n')
+            except OSError:
+                pass
+
+
+def records():
+    with _lock:
+        return list(_records)
+
+
+def clear():
+    with _lock:
+        _records.clear()
+
+
+def to_jsonl(spans):
+    return ''.join(json.dumps(span, default=str) + '\n' for span in spans)
+
+
+def summarize(spans):
+    """One row per span name: calls, timings, rows, cache hit rate and mean memory delta."""
+    import pandas as pd
+    df = pd.DataFrame(spans)
+    if df.empty:
+        return df
+    df['hit'] = df['cache'] == 'hit'
+    df['miss'] = df['cache'] == 'miss'
+    df['rows'] = pd.to_numeric(df['rows'])
+    df['mem_delta_mb'] = pd.to_numeric(df['mem_delta_mb'])
+    grouped = df.groupby('name', sort=False)
+    out = pd.DataFrame({
+        'Page': grouped['page'].first(),
+        'Calls': grouped.size(),
+        'Total_s': grouped['seconds'].sum(),
+        'Mean_s': grouped['seconds'].mean(),
+        'P95_s': grouped['seconds'].quantile(0.95),
+        'Max_s': grouped['seconds'].max(),
+        'Mean_Rows': grouped['rows'].mean(),
+        'Cache_Hits': grouped['hit'].sum(),
+        'Cache_Misses': grouped['miss'].sum(),
+        'Mean_Mem_Delta_MB': grouped['mem_delta_mb'].mean(),
+    })
+    lookups = out['Cache_Hits'] + out['Cache_Misses']
+    out['Hit_Rate'] = (out['Cache_Hits'] / lookups).where(lookups > 0)
+    return out.sort_values('Total_s', ascending=False).reset_index().rename(columns={'name': 'Span'})
@@ -0,0 +1,42 @@
+# features.py
+
+import numpy as np
+import pandas as pd
+
+
+# ----------------------------
+# Customer-Level Features
+# ----------------------------
+# Mirrors the feature engineering in the ML notebook: per-customer order count,
+# return rate and average order value, and the rule-based segment built on them.
+SEGMENTS = ['Premium Buyers', 'Value Shoppers', 'High-Return Customers', 'Moderate Shoppers']
+
+
+def customer_features(df):
+    """One row per Customer_ID with the aggregates the segment rules use."""
+    return df.groupby('Customer_ID', observed=True).agg(
+        Customer_Order_Count=('Has_Return', 'size'),
+        Customer_Return_Rate=('Has_Return', 'mean'),
+        Customer_Avg_Order_Value=('Order_Value_Numeric', 'mean'),
+    )
+
+
+def assign_segments(avg_order_value, return_rate):
+    """
+    Vectorized version of the notebook's assign_customer_segment().
+
+    Customers with no history (NaN inputs) are left unlabelled.
+    """
+    avg_order_value = np.asarray(avg_order_value, dtype=np.float64)
+    return_rate = np.asarray(return_rate, dtype=np.float64)
+    codes = np.select(
+        [
+            (avg_order_value > 300) & (return_rate < 0.01),
+            return_rate < 0.01,
+            return_rate > 0.5,
+        ],
+        [0, 1, 2],
+        default=3,
+    )
+    codes[np.isnan(avg_order_value) | np.isnan(return_rate)] = -1
+    return pd.Categorical.from_codes(codes, categories=SEGMENTS)
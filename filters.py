@@ -0,0 +1,133 @@
+# filters.py
+
+import numpy as np
+import pandas as pd
+
+
+# ----------------------------
+# Dimension Index for Global Filters
+# ----------------------------
+# Built once per dataset. Every filter dimension keeps its per-row category codes plus
+# a CSR-style posting list: the row positions of each value, stored contiguously and in
+# ascending order. A filter combination starts from the posting lists of the most
+# selective dimension and narrows that candidate set with code lookups on the other
+# dimensions, so the work is proportional to the selected rows rather than the table.
+FILTER_DIMENSIONS = ['Product_Category', 'Platform_Name', 'Delivery_Status', 'Has_Guarantee']
+DATE_COLUMN = 'Customer_Session_Start_Date'
+
+
+class DimensionIndex:
+    def __init__(self, df, dimensions=FILTER_DIMENSIONS, date_column=DATE_COLUMN):
+        self.n_rows = len(df)
+        pos_dtype = np.int32 if self.n_rows < 2 ** 31 else np.int64
+        self.levels = {}
+        self.codes = {}
+        self.postings = {}
+        self.offsets = {}
+        for dim in dimensions:
+            if dim not in df.columns:
+                continue
+            col = df[dim]
+            if isinstance(col.dtype, pd.CategoricalDtype):
+                codes, levels = col.cat.codes.to_numpy(), col.cat.categories
+            else:
+                codes, levels = pd.factorize(col, sort=True)
+            codes = codes.astype(np.int16 if len(levels) < 2 ** 15 else np.int32)
+            counts = np.bincount(codes[codes >= 0], minlength=len(levels))
+            self.levels[dim] = pd.Index(levels)
+            self.codes[dim] = codes
+            self.postings[dim] = np.argsort(codes, kind='stable').astype(pos_dtype)[(codes < 0).sum():]
+            self.offsets[dim] = np.concatenate([[0], np.cumsum(counts)])
+
+        self.dates = None
+        if date_column in df.columns:
+            dates = pd.to_datetime(df[date_column], errors='coerce').to_numpy('datetime64[D]')
+            self.dates = dates
+            order = np.argsort(dates, kind='stable')
+            self.date_order = order[~np.isnat(dates[order])].astype(pos_dtype)
+            self.sorted_dates = dates[self.date_order]
+
+    @property
+    def date_bounds(self):
+        if self.dates is None or not len(self.sorted_dates):
+            return None
+        return self.sorted_dates[0], self.sorted_dates[-1]
+
+    def options(self, dim):
+        return list(self.levels[dim])
+
+    def _value_codes(self, dim, values):
+        codes = self.levels[dim].get_indexer(list(values))
+        return codes[codes >= 0]
+
+    def _posting(self, dim, codes):
+        offsets = self.offsets[dim]
+        parts = [self.postings[dim][offsets[c]:offsets[c + 1]] for c in codes]
+        if len(parts) == 1:
+            return parts[0]
+        return np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+
+    def select(self, selections=None, date_range=None):
+        """
+        Row positions matching every filter, in ascending order.
+
+        ``selections`` maps a dimension to the values to keep; an empty or missing
+        selection leaves that dimension unfiltered. ``date_range`` is an inclusive
+        (start, end) pair of dates. Returns None when nothing is filtered.
+        """
+        active = {}
+        for dim, values in (selections or {}).items():
+            if dim not in self.levels or not values:
+                continue
+            codes = self._value_codes(dim, values)
+            if len(codes) == len(self.levels[dim]):
+                continue
+            active[dim] = codes
+
+        date_window = None
+        if date_range is not None and self.dates is not None:
+            lo_day = np.datetime64(pd.Timestamp(date_range[0]).date(), 'D')
+            hi_day = np.datetime64(pd.Timestamp(date_range[1]).date(), 'D')
+            lo = np.searchsorted(self.sorted_dates, lo_day, side='left')
+            hi = np.searchsorted(self.sorted_dates, hi_day, side='right')
+            # A range spanning every dated order is no filter at all
+            if lo > 0 or hi < len(self.sorted_dates):
+                date_window = (lo_day, hi_day, lo, hi)
+
+        if not active and date_window is None:
+            return None
+
+        # Seed with the most selective filter, then narrow it by the others
+        sizes = {dim: int(np.diff(self.offsets[dim])[codes].sum()) for dim, codes in active.items()}
+        seed = min(sizes, key=sizes.get) if sizes else None
+        if date_window is not None and (seed is None or date_window[3] - date_window[2] < sizes[seed]):
+            rows = np.sort(self.date_order[date_window[2]:date_window[3]])
+            seed = None
+        else:
+            rows = self._posting(seed, active[seed])
+
+        for dim, codes in active.items():
+            if dim == seed or not len(rows):
+                continue
+            lookup = np.zeros(len(self.levels[dim]) + 1, dtype=bool)
+            lookup[codes] = True
+            # Code -1 (missing) indexes the trailing False slot
+            rows = rows[lookup[self.codes[dim][rows]]]
+
+        if date_window is not None and seed is not None and len(rows):
+            day = self.dates[rows]
+            rows = rows[(day >= date_window[0]) & (day <= date_window[1])]
+        return rows
+
+
+def take_rows(df, rows, columns):
+    """Gather only ``columns`` at ``rows`` into a new frame (cheaper than df.iloc[rows])."""
+    columns = [c for c in dict.fromkeys(columns) if c in df.columns]
+    return pd.DataFrame({c: df[c].iloc[rows] for c in columns})
+
+
+def filter_key(selections, date_range):
+    """Hashable, order-independent key for a filter combination (for caching)."""
+    sel = tuple(sorted((dim, tuple(sorted(map(str, values)))) for dim, values in selections.items() if values))
+    dates = tuple(str(d) for d in date_range) if date_range is not None else None
+    return sel, dates
@@ -0,0 +1,185 @@
+# ingest.py
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+# ----------------------------
+# Order File Schema
+# ----------------------------
+# String dimensions are stored as categoricals, 0/1 flags as int8, the numeric
+# measures as float32 and session dates as datetimes. Columns not listed here keep
+# pandas' inferred dtype.
+CATEGORY_COLUMNS = ['Product_Category', 'Platform_Name', 'Delivery_Status', 'Customer_Segment']
+FLAG_COLUMNS = ['Has_Return', 'Has_Guarantee', 'Guarantee_Shown']
+FLOAT_COLUMNS = ['Order_Value_Numeric', 'Actual_Delivery_Days', 'Customer_Return_Rate']
+DATE_COLUMNS = ['Customer_Session_Start_Date']
+
+SIDECAR_VERSION = 2
+CHUNK_ROWS = 250_000
+_HASH_BLOCK = 1 << 20
+
+
+def file_hash(path):
+    """Streaming BLAKE2b digest of a file, read in 1 MiB blocks."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(_HASH_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def sidecar_paths(csv_path):
+    base, _ = os.path.splitext(csv_path)
+    return base + '.parquet', base + '.parquet.json'
+
+
+def is_parquet(source):
+    """Whether a path or named file-like object is a Parquet file (by extension)."""
+    name = source if isinstance(source, str) else getattr(source, 'name', '')
+    return str(name).lower().endswith(('.parquet', '.pq'))
+
+
+def _csv_dtypes(header):
+    dtype = {c: 'category' for c in CATEGORY_COLUMNS if c in header}
+    dtype.update({c: 'float32' for c in FLOAT_COLUMNS if c in header})
+    # Flags are read as float32 so a stray blank cell does not abort the parse
+    dtype.update({c: 'float32' for c in FLAG_COLUMNS if c in header})
+    return dtype
+
+
+def read_csv_typed(csv_path):
+    """Parse the order CSV straight into the declared schema."""
+    header = pd.read_csv(csv_path, nrows=0).columns
+    parse_dates = [c for c in DATE_COLUMNS if c in header]
+    df = pd.read_csv(csv_path, dtype=_csv_dtypes(header), parse_dates=parse_dates)
+    return coerce_schema(df)
+
+
+def iter_order_chunks(source, chunk_rows=CHUNK_ROWS, columns=None, row_groups=None):
+    """
+    Yield typed DataFrame chunks of at most ``chunk_rows`` rows from a CSV or Parquet
+    path or file-like object, so memory is bounded by the chunk size.
+
+    ``columns`` limits the read to those columns (missing ones are skipped);
+    ``row_groups`` restricts a Parquet read to the given row groups.
+    """
+    if is_parquet(source):
+        import pyarrow.parquet as pq
+        parquet = pq.ParquetFile(source)
+        if columns is not None:
+            columns = [c for c in columns if c in parquet.schema_arrow.names]
+        for batch in parquet.iter_batches(batch_size=chunk_rows, columns=columns, row_groups=row_groups):
+            yield coerce_schema(batch.to_pandas())
+    else:
+        wanted = None if columns is None else set(columns)
+        dtype = _csv_dtypes(CATEGORY_COLUMNS + FLOAT_COLUMNS + FLAG_COLUMNS)
+        usecols = None if wanted is None else wanted.__contains__
+        for chunk in pd.read_csv(source, chunksize=chunk_rows, dtype=dtype, usecols=usecols):
+            yield coerce_schema(chunk)
+
+
+def coerce_schema(df):
+    """Apply the schema to an already-loaded frame (in place) and return it."""
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    for col in FLAG_COLUMNS:
+        if col in df.columns and df[col].dtype != np.int8:
+            df[col] = df[col].fillna(0).astype(np.int8)
+    for col in FLOAT_COLUMNS:
+        if col in df.columns and df[col].dtype != np.float32:
+            df[col] = df[col].astype(np.float32)
+    for col in DATE_COLUMNS:
+        if col in df.columns and not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+    return df
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def fresh_sidecar(csv_path):
+    """Path of the Parquet sidecar if it is current for ``csv_path`` (same mtime and size), else None."""
+    parquet_path, meta_path = sidecar_paths(csv_path)
+    meta = _read_meta(meta_path)
+    if meta is None or meta.get('version') != SIDECAR_VERSION or not os.path.exists(parquet_path):
+        return None
+    stat = os.stat(csv_path)
+    if meta['mtime_ns'] != stat.st_mtime_ns or meta['size'] != stat.st_size:
+        return None
+    return parquet_path
+
+
+def load_orders(csv_path, use_sidecar=True):
+    """
+    Load the order file with typed columns, going through a Parquet sidecar.
+
+    The sidecar is reused while the CSV's mtime and size are unchanged. If either
+    changed, the CSV is re-hashed and the sidecar is still reused when the content
+    hash matches (e.g. a redeploy that only touched the file). Otherwise the CSV
+    is parsed and the sidecar rewritten. The content hash is exposed as
+    ``df.attrs['fingerprint']`` so downstream caches can key on it cheaply.
+    """
+    if not use_sidecar:
+        df = read_csv_typed(csv_path)
+        df.attrs['fingerprint'] = file_hash(csv_path)
+        return df
+
+    parquet_path, meta_path = sidecar_paths(csv_path)
+    stat = os.stat(csv_path)
+    meta = _read_meta(meta_path)
+    sidecar_ok = (
+        meta is not None
+        and meta.get('version') == SIDECAR_VERSION
+        and os.path.exists(parquet_path)
+    )
+
+    if sidecar_ok and meta['mtime_ns'] == stat.st_mtime_ns and meta['size'] == stat.st_size:
+        fingerprint = meta['sha']
+    else:
+        fingerprint = file_hash(csv_path)
+        sidecar_ok = sidecar_ok and meta['sha'] == fingerprint
+
+    if sidecar_ok:
+        df = coerce_schema(pd.read_parquet(parquet_path))
+    else:
+        df = read_csv_typed(csv_path)
+
+    if not sidecar_ok or meta['mtime_ns'] != stat.st_mtime_ns:
+        # Written to temporary files and renamed into place, so a crash never leaves a
+        # truncated sidecar. Any failure (read-only deploy, missing Parquet engine, a
+        # column Arrow cannot encode) just skips the cache; the CSV frame is still returned.
+        tmp_paths = []
+        try:
+            if not sidecar_ok:
+                tmp_paths.append(parquet_path + '.tmp')
+                df.to_parquet(tmp_paths[-1], index=False)
+                os.replace(tmp_paths.pop(), parquet_path)
+            tmp_paths.append(meta_path + '.tmp')
+            with open(tmp_paths[-1], 'w') as fh:
+                json.dump({
+                    'version': SIDECAR_VERSION,
+                    'mtime_ns': stat.st_mtime_ns,
+                    'size': stat.st_size,
+                    'sha': fingerprint,
+                }, fh)
+            os.replace(tmp_paths.pop(), meta_path)
+        except Exception:
+            for path in tmp_paths:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    df.attrs['fingerprint'] = fingerprint
+    return df
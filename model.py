@@ -0,0 +1,259 @@
+# model.py
+
+import os
+import warnings
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
+from sklearn.impute import SimpleImputer
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, precision_recall_fscore_support, roc_auc_score
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+from features import assign_segments, customer_features
+
+
+# ----------------------------
+# Return-Risk Model
+# ----------------------------
+# Same setup as the ML notebook: customer history, delivery, value and guarantee
+# features, one-hot segment/status/category/platform dummies (first level dropped),
+# and a class-balanced, L2-regularised logistic regression. Random Forest and Gradient
+# Boosting are trained on the same split as comparators for the metrics table.
+# Segments come from the K-Means segmenter, which is stored with the model so new
+# orders are segmented the same way at scoring time.
+#
+# The fitted logistic pipeline and all metrics are persisted with joblib under a name
+# that includes the data fingerprint, so the model is retrained only when the data
+# (or MODEL_VERSION) changes.
+MODEL_VERSION = 4
+MODEL_DIR = "models"
+TARGET = 'Has_Return'
+NUMERIC_FEATURES = [
+    'Actual_Delivery_Days', 'Order_Value_Numeric', 'Guarantee_Shown',
+    'Customer_Return_Rate', 'Customer_Order_Count', 'Customer_Avg_Order_Value',
+]
+CATEGORICAL_FEATURES = ['Customer_Segment', 'Delivery_Status', 'Product_Category', 'Platform_Name']
+MAX_TRAIN_ROWS = 500_000
+RANDOM_STATE = 42
+
+
+def model_frame(df, segments=None, customers=None, segmenter=None):
+    """
+    Feature matrix for the return model, one row per order aligned with ``df``.
+
+    Customer aggregates are looked up by Customer_ID in ``customers`` (a
+    features.customer_features() table built from past or training orders). They are
+    never taken from ``df`` itself: neither derived from its rows nor read from the
+    aggregate columns the order file may carry, which are computed over every order
+    including the order's own outcome. Unless passed in, segments come from the fitted
+    ``segmenter`` applied to those customer features, or the notebook's segment rules;
+    a Customer_Segment column in the file is ignored for the same reason. Features that
+    cannot be built are left as NaN and imputed by the pipeline.
+    """
+    X = pd.DataFrame(index=df.index)
+    for col in ['Actual_Delivery_Days', 'Order_Value_Numeric', 'Guarantee_Shown']:
+        X[col] = df[col].astype(np.float32) if col in df.columns else np.float32(np.nan)
+
+    customer_cols = ['Customer_Return_Rate', 'Customer_Order_Count', 'Customer_Avg_Order_Value']
+    if 'Customer_ID' in df.columns and customers is not None:
+        positions = customers.index.get_indexer(df['Customer_ID'])
+        for col in customer_cols:
+            values = customers[col].to_numpy(dtype=np.float32)[positions]
+            X[col] = np.where(positions >= 0, values, np.nan)
+    else:
+        for col in customer_cols:
+            X[col] = np.float32(np.nan)
+
+    if segments is None:
+        if segmenter is not None:
+            segments = segmenter.predict(X)
+        else:
+            segments = assign_segments(X['Customer_Avg_Order_Value'], X['Customer_Return_Rate'])
+    X['Customer_Segment'] = np.asarray(segments, dtype=object)
+    for col in ['Delivery_Status', 'Product_Category', 'Platform_Name']:
+        X[col] = df[col].astype(object) if col in df.columns else np.nan
+    return X
+
+
+def make_preprocessor():
+    return ColumnTransformer([
+        ('num', Pipeline([
+            ('impute', SimpleImputer(strategy='median', keep_empty_features=True)),
+            ('scale', StandardScaler()),
+        ]), NUMERIC_FEATURES),
+        ('cat', Pipeline([
+            ('impute', SimpleImputer(strategy='constant', fill_value='Unknown', keep_empty_features=True)),
+            ('onehot', OneHotEncoder(drop='first', handle_unknown='ignore')),
+        ]), CATEGORICAL_FEATURES),
+    ], verbose_feature_names_out=False)
+
+
+def make_models():
+    return {
+        'Logistic Regression': LogisticRegression(
+            class_weight='balanced', C=0.1, solver='liblinear', max_iter=5000, random_state=RANDOM_STATE
+        ),
+        'Random Forest': RandomForestClassifier(
+            n_estimators=100, min_samples_leaf=5, n_jobs=-1, random_state=RANDOM_STATE
+        ),
+        'Gradient Boosting': HistGradientBoostingClassifier(random_state=RANDOM_STATE),
+    }
+
+
+def _class_report(y_true, y_pred):
+    precision, recall, f1, support = precision_recall_fscore_support(y_true, y_pred, labels=[0, 1], zero_division=0)
+    return pd.DataFrame({
+        'Class': ['No Return (0)', 'Return (1)'],
+        'Precision': precision,
+        'Recall': recall,
+        'F1-score': f1,
+        'Support': support,
+    })
+
+
+def coefficient_table(pipeline):
+    """Logistic regression coefficients on the standardised / one-hot features."""
+    names = pipeline.named_steps['prep'].get_feature_names_out()
+    coef = pipeline.named_steps['model'].coef_[0]
+    table = pd.DataFrame({'Feature': names, 'Coefficient': coef})
+    return table.reindex(table['Coefficient'].abs().sort_values(ascending=False).index).reset_index(drop=True)
+
+
+def _feature_label(name):
+    for col in CATEGORICAL_FEATURES:
+        if name.startswith(col + '_'):
+            return f"{col.replace('_', ' ')}: {name[len(col) + 1:]}"
+    return name.replace('_', ' ')
+
+
+def coefficient_findings(coefficients, limit=3):
+    """Markdown bullets naming the features that raise and lower predicted return risk most."""
+    def names(rows):
+        return ", ".join(f"**{_feature_label(f)}** ({c:+.2f})" for f, c in zip(rows['Feature'], rows['Coefficient']))
+
+    raising = coefficients[coefficients['Coefficient'] > 0].nlargest(limit, 'Coefficient')
+    lowering = coefficients[coefficients['Coefficient'] < 0].nsmallest(limit, 'Coefficient')
+    bullets = []
+    if len(raising):
+        bullets.append(f"Strongest drivers of return risk: {names(raising)}.")
+    if len(lowering):
+        bullets.append(f"Strongest reducers of return risk: {names(lowering)}.")
+    return "\n".join(f"- {bullet}" for bullet in bullets)
+
+
+def training_split(df):
+    """Stratified train/test row positions and labels; the same for the same data."""
+    y = df[TARGET].to_numpy().astype(np.int8)
+    positions = np.arange(len(df))
+    if len(df) > MAX_TRAIN_ROWS / 0.8:
+        positions, _, y, _ = train_test_split(
+            positions, y, train_size=int(MAX_TRAIN_ROWS / 0.8), stratify=y, random_state=RANDOM_STATE
+        )
+    return train_test_split(positions, y, test_size=0.2, stratify=y, random_state=RANDOM_STATE)
+
+
+def training_customers(df, train_positions=None):
+    """
+    Customer history table the model is trained with: aggregates over the training
+    split only. Rescoring the loaded orders (e.g. the what-if baseline) should use it
+    so their features are built exactly as in training. None without Customer_ID.
+    """
+    if 'Customer_ID' not in df.columns:
+        return None
+    if train_positions is None:
+        train_positions = training_split(df)[0]
+    return customer_features(df.iloc[train_positions])
+
+
+def train(df, segmenter=None):
+    """
+    Fit all models on a stratified split and return the persisted artifact dict.
+
+    Customer history features are aggregated from the training orders only, so no
+    test order's outcome reaches its own features.
+    """
+    train_positions, test_positions, y_train, y_test = training_split(df)
+    customers = training_customers(df, train_positions)
+    X_train = model_frame(df.iloc[train_positions], customers=customers, segmenter=segmenter)
+    X_test = model_frame(df.iloc[test_positions], customers=customers, segmenter=segmenter)
+
+    rows = []
+    fitted = {}
+    for name, estimator in make_models().items():
+        pipeline = Pipeline([('prep', make_preprocessor()), ('model', estimator)])
+        pipeline.fit(X_train, y_train)
+        with warnings.catch_warnings():
+            # Test customers with no training orders have no segment, which encodes as all zeros
+            warnings.filterwarnings('ignore', message='Found unknown categories')
+            proba = pipeline.predict_proba(X_test)[:, 1]
+        pred = (proba >= 0.5).astype(np.int8)
+        rows.append({
+            'Model': name,
+            'Accuracy': accuracy_score(y_test, pred),
+            'AUC': roc_auc_score(y_test, proba),
+        })
+        fitted[name] = (pipeline, pred)
+
+    logistic, logistic_pred = fitted['Logistic Regression']
+    return {
+        'version': MODEL_VERSION,
+        'pipeline': logistic,
+        'segmenter': segmenter,
+        'metrics': pd.DataFrame(rows),
+        'report': _class_report(y_test, logistic_pred),
+        'coefficients': coefficient_table(logistic),
+        'train_rows': len(X_train),
+        'test_rows': len(X_test),
+        'trained_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'sklearn_version': sklearn.__version__,
+    }
+
+
+def artifact_path(fingerprint, model_dir=MODEL_DIR):
+    return os.path.join(model_dir, f"return_model-v{MODEL_VERSION}-{fingerprint}.joblib")
+
+
+def latest_artifact(model_dir=MODEL_DIR):
+    """Most recently written model artifact in ``model_dir``, or None."""
+    if not os.path.isdir(model_dir):
+        return None
+    paths = [
+        os.path.join(model_dir, name) for name in os.listdir(model_dir)
+        if name.startswith(f"return_model-v{MODEL_VERSION}-") and name.endswith('.joblib')
+    ]
+    return max(paths, key=os.path.getmtime) if paths else None
+
+
+def load_or_train(df, fingerprint, segmenter=None, model_dir=MODEL_DIR):
+    """
+    Load the persisted artifact for this data fingerprint, training it on a miss.
+
+    Data without a fingerprint is trained on every call and never persisted, since
+    there is nothing to key the artifact on.
+    """
+    if fingerprint is None:
+        return train(df, segmenter)
+    path = artifact_path(fingerprint, model_dir)
+    if os.path.exists(path):
+        artifact = joblib.load(path)
+        if artifact.get('sklearn_version') == sklearn.__version__:
+            return artifact
+
+    artifact = train(df, segmenter)
+    artifact['fingerprint'] = fingerprint
+    try:
+        os.makedirs(model_dir, exist_ok=True)
+        tmp = path + '.tmp'
+        joblib.dump(artifact, tmp, compress=3)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+    return artifact
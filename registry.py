@@ -0,0 +1,397 @@
+# registry.py
+
+import argparse
+import copy
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from aggregates import CUBE_COLUMNS, PARTIAL_VERSION, finish_eda, merge_eda, partial_eda, rollup
+from ingest import CHUNK_ROWS, DATE_COLUMNS, coerce_schema, file_hash, iter_order_chunks
+
+
+# ----------------------------
+# Multi-Month Dataset Registry
+# ----------------------------
+# Order history is kept as a Hive-partitioned Parquet dataset under REGISTRY_ROOT,
+# laid out as Order_Month=YYYY-MM/Product_Category=<category>/part-*.parquet with the
+# month taken from the session start date. A JSON manifest records the rows, in-memory
+# size and source batches of every month, and each month's EDA partial
+# (aggregates.partial_eda) is cached beside it together with the running total, under a
+# directory named for the partial layout version.
+#
+# Appending a batch writes only that batch's files and folds its partials into the
+# months it touches and the total, so refresh cost follows the new data rather than the
+# history. Date-range reads open only the month partitions in range (and the category
+# partitions, if asked), and range aggregates reuse the cached partial of every month
+# the range covers in full, scanning only the boundary months.
+#
+# The manifest is the commit point: data files of a batch it does not list and cached
+# partials recording a different batch list are ignored, so an append that fails
+# part-way leaves the registry as it was and can simply be retried.
+REGISTRY_ROOT = os.path.join("data", "orders")
+MONTH_COLUMN = 'Order_Month'
+PARTITION_COLUMNS = [MONTH_COLUMN, 'Product_Category']
+DATE_COLUMN = DATE_COLUMNS[0]
+MISSING_MONTH = "unknown"
+MANIFEST_NAME = "_registry.json"
+AGGREGATE_DIR = "_aggregates"
+REGISTRY_VERSION = 1
+
+
+def _partitioning():
+    return ds.partitioning(pa.schema([(c, pa.string()) for c in PARTITION_COLUMNS]), flavor='hive')
+
+
+def _to_arrow(chunk):
+    table = pa.Table.from_pandas(chunk, preserve_index=False)
+    # Category sets differ from chunk to chunk, so strings are stored plain (Parquet
+    # dictionary-encodes them anyway) and timestamps at one resolution
+    for i, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type) or pa.types.is_large_string(field.type):
+            target = pa.string()
+        elif pa.types.is_timestamp(field.type):
+            target = pa.timestamp('us')
+        else:
+            continue
+        table = table.set_column(i, field.name, table.column(i).cast(target))
+    return table
+
+
+def _month_keys(chunk):
+    if DATE_COLUMN not in chunk.columns:
+        return pd.Series(MISSING_MONTH, index=chunk.index)
+    return chunk[DATE_COLUMN].dt.strftime('%Y-%m').fillna(MISSING_MONTH).astype(str)
+
+
+def _month_bounds(month):
+    first = pd.Timestamp(f"{month}-01")
+    return first, first + pd.offsets.MonthEnd(0)
+
+
+class DatasetRegistry:
+    def __init__(self, root=REGISTRY_ROOT):
+        self.root = root
+        self.manifest = self._read_manifest()
+
+    @staticmethod
+    def available(root=REGISTRY_ROOT):
+        return os.path.exists(os.path.join(root, MANIFEST_NAME))
+
+    # ---- manifest ----
+    def _read_manifest(self):
+        try:
+            with open(os.path.join(self.root, MANIFEST_NAME)) as fh:
+                manifest = json.load(fh)
+            if manifest.get('version') == REGISTRY_VERSION:
+                return manifest
+        except (OSError, ValueError):
+            pass
+        return {'version': REGISTRY_VERSION, 'months': {}, 'batches': []}
+
+    def _write_manifest(self, manifest):
+        path = os.path.join(self.root, MANIFEST_NAME)
+        with open(path + '.tmp', 'w') as fh:
+            json.dump(manifest, fh, indent=1)
+        os.replace(path + '.tmp', path)
+        self.manifest = manifest
+
+    @property
+    def months(self):
+        """Partition months in order ('unknown', for orders without a date, sorts last)."""
+        return sorted(self.manifest['months'])
+
+    @property
+    def rows(self):
+        return sum(m['rows'] for m in self.manifest['months'].values())
+
+    @property
+    def memory_bytes(self):
+        """Approximate size of the whole history as a typed in-memory frame."""
+        return sum(m['memory_bytes'] for m in self.manifest['months'].values())
+
+    @property
+    def fingerprint(self):
+        """Changes whenever a batch is appended; use it to key caches."""
+        ids = json.dumps([b['id'] for b in self.manifest['batches']])
+        return hashlib.blake2b(ids.encode(), digest_size=16).hexdigest()
+
+    @property
+    def date_bounds(self):
+        dated = [m for m in self.months if m != MISSING_MONTH]
+        if not dated:
+            return None
+        return _month_bounds(dated[0])[0], _month_bounds(dated[-1])[1]
+
+    def has_batch(self, batch_id):
+        return any(b['id'] == batch_id for b in self.manifest['batches'])
+
+    # ---- data files ----
+    def _files(self, batch_ids=None):
+        """Data files of the given batches (default: every batch in the manifest)."""
+        if batch_ids is None:
+            batch_ids = [b['id'] for b in self.manifest['batches']]
+        prefixes = tuple(f"part-{batch_id}-" for batch_id in batch_ids)
+        files = []
+        for directory, subdirs, names in os.walk(self.root):
+            subdirs[:] = [d for d in subdirs if not d.startswith(('_', '.'))]
+            files.extend(
+                os.path.join(directory, name) for name in names
+                if name.startswith(prefixes) and name.endswith('.parquet')
+            )
+        return sorted(files)
+
+    def _dataset(self, batch_ids=None):
+        return ds.dataset(
+            self._files(batch_ids), format='parquet', partitioning=_partitioning(), partition_base_dir=self.root,
+        )
+
+    def _remove_files(self, batch_id):
+        for path in self._files([batch_id]):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    # ---- cached partials ----
+    def _partial_path(self, month=None):
+        name = 'total' if month is None else f"{MONTH_COLUMN}={month}"
+        return os.path.join(self.root, AGGREGATE_DIR, f"v{PARTIAL_VERSION}", name + '.pkl')
+
+    def _partial_batches(self, month=None, manifest=None):
+        """Ids of the batches a month's partial (None: the total) covers under a manifest."""
+        batches = (manifest or self.manifest)['batches']
+        return [b['id'] for b in batches if month is None or month in b['months']]
+
+    def _load_partial(self, month=None):
+        path = self._partial_path(month)
+        if not os.path.exists(path):
+            return None
+        # Partials are stored with the batch ids they cover; one staged by an append
+        # whose manifest was never written does not match and is rebuilt
+        cached = pd.read_pickle(path)
+        if not isinstance(cached, tuple) or cached[0] != self._partial_batches(month):
+            return None
+        return cached[1]
+
+    def _save_partial(self, partial, month=None, manifest=None):
+        path = self._partial_path(month)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            pd.to_pickle((self._partial_batches(month, manifest), partial), path + '.tmp')
+            os.replace(path + '.tmp', path)
+        except OSError:
+            # A read-only deploy just recomputes missing partials on demand
+            pass
+
+    def _scan_partial(self, month):
+        chunks = self.iter_chunks(months=[month], columns=CUBE_COLUMNS)
+        partials = [partial_eda(chunk) for chunk in chunks]
+        return merge_eda(partials) if partials else None
+
+    def month_partial(self, month=None):
+        """
+        Cached EDA partial of one month (None: all months), or None without data.
+
+        A missing cache entry (e.g. after a PARTIAL_VERSION bump) is rebuilt from the
+        month's files, or for the total from the month partials, and saved.
+        """
+        partial = self._load_partial(month)
+        if partial is None:
+            if month is None:
+                months = [p for p in map(self.month_partial, self.months) if p is not None]
+                partial = merge_eda(months) if months else None
+            elif month in self.manifest['months']:
+                partial = self._scan_partial(month)
+            if partial is not None:
+                self._save_partial(partial, month)
+        return partial
+
+    # ---- writes ----
+    def append(self, source, batch_id=None, chunk_rows=CHUNK_ROWS):
+        """
+        Add an order file (CSV or Parquet) to the registry, chunk by chunk.
+
+        Batches are identified by ``batch_id`` (default: the file's content hash for a
+        path) so appending the same file twice is a no-op. The batch's files and
+        partials are staged first and committed by a single manifest write; on failure
+        the staged files are removed. Returns the months touched.
+        """
+        if batch_id is None and isinstance(source, str):
+            batch_id = file_hash(source)
+        if batch_id is not None and self.has_batch(batch_id):
+            return []
+        tag = batch_id or datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S%f')
+
+        # Files left by an earlier attempt at this batch were never committed
+        self._remove_files(tag)
+        try:
+            partials, added = {}, {}
+            for n, chunk in enumerate(iter_order_chunks(source, chunk_rows)):
+                chunk[MONTH_COLUMN] = _month_keys(chunk)
+                ds.write_dataset(
+                    _to_arrow(chunk), self.root, format='parquet', partitioning=_partitioning(),
+                    basename_template=f"part-{tag}-{n}-{{i}}.parquet",
+                    existing_data_behavior='overwrite_or_ignore',
+                )
+                for month, part in chunk.groupby(MONTH_COLUMN, sort=False):
+                    current = partial_eda(part)
+                    partials[month] = current if month not in partials else merge_eda([partials[month], current])
+                    stats = added.setdefault(month, {'rows': 0, 'memory_bytes': 0})
+                    stats['rows'] += len(part)
+                    stats['memory_bytes'] += int(part.drop(columns=MONTH_COLUMN).memory_usage(deep=True).sum())
+
+            manifest = copy.deepcopy(self.manifest)
+            for month in added:
+                entry = manifest['months'].setdefault(month, {'rows': 0, 'memory_bytes': 0})
+                entry['rows'] += added[month]['rows']
+                entry['memory_bytes'] += added[month]['memory_bytes']
+            manifest['batches'].append({
+                'id': tag,
+                'source': source if isinstance(source, str) else getattr(source, 'name', None),
+                'rows': sum(s['rows'] for s in added.values()),
+                'months': sorted(added),
+                'added_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            })
+
+            # Stage the batch folded into the cached month partials and the running
+            # total, recorded against the new manifest. A month whose cache is missing
+            # is rebuilt from its files once the batch is committed.
+            rebuild = []
+            for month, partial in partials.items():
+                cached = self._load_partial(month)
+                if cached is not None:
+                    self._save_partial(merge_eda([cached, partial]), month, manifest)
+                elif month in self.manifest['months']:
+                    rebuild.append(month)
+                else:
+                    self._save_partial(partial, month, manifest)
+            total = self._load_partial()
+            if total is not None and partials:
+                self._save_partial(merge_eda([total, *partials.values()]), manifest=manifest)
+
+            self._write_manifest(manifest)
+        except BaseException:
+            self._remove_files(tag)
+            raise
+
+        for month in rebuild:
+            self.month_partial(month)
+        if total is None:
+            self.month_partial()
+        return sorted(added)
+
+    # ---- reads ----
+    def months_between(self, start=None, end=None):
+        """Months overlapping the inclusive date range; undated orders only when unbounded."""
+        if start is None and end is None:
+            return self.months
+        lo = pd.Timestamp(start).strftime('%Y-%m') if start is not None else ''
+        hi = pd.Timestamp(end).strftime('%Y-%m') if end is not None else '9999-12'
+        return [m for m in self.months if m != MISSING_MONTH and lo <= m <= hi]
+
+    def _scanner(self, start=None, end=None, months=None, categories=None, columns=None, batch_size=CHUNK_ROWS):
+        dataset = self._dataset()
+        if columns is not None:
+            columns = [c for c in dict.fromkeys(columns) if c in dataset.schema.names]
+        # Partition filters prune whole directories; the date bounds then apply per row
+        months = self.months_between(start, end) if months is None else months
+        expr = ds.field(MONTH_COLUMN).isin(months)
+        if categories:
+            expr &= ds.field('Product_Category').isin(list(categories))
+        if start is not None:
+            expr &= ds.field(DATE_COLUMN) >= pa.scalar(pd.Timestamp(start).normalize(), pa.timestamp('us'))
+        if end is not None:
+            day_after = pd.Timestamp(end).normalize() + pd.Timedelta(days=1)
+            expr &= ds.field(DATE_COLUMN) < pa.scalar(day_after, pa.timestamp('us'))
+        return dataset.scanner(columns=columns, filter=expr, batch_size=batch_size)
+
+    def read(self, start=None, end=None, categories=None, columns=None):
+        """Typed order frame for an inclusive date range, reading only the partitions in range."""
+        table = self._scanner(start, end, categories=categories, columns=columns).to_table()
+        df = coerce_schema(table.to_pandas())
+        if MONTH_COLUMN in df.columns:
+            df = df.drop(columns=MONTH_COLUMN)
+        df.attrs['fingerprint'] = self.fingerprint
+        return df
+
+    def iter_chunks(self, start=None, end=None, months=None, categories=None, columns=None, chunk_rows=CHUNK_ROWS):
+        """Typed chunks for a date range, like ingest.iter_order_chunks()."""
+        scanner = self._scanner(start, end, months, categories, columns, chunk_rows)
+        for batch in scanner.to_batches():
+            if batch.num_rows:
+                yield coerce_schema(batch.to_pandas())
+
+    def read_batch(self, batch_id, columns=None):
+        """Typed rows of one appended batch, e.g. to feed another incremental store."""
+        batch = self._dataset([batch_id])
+        if columns is not None:
+            columns = [c for c in dict.fromkeys(columns) if c in batch.schema.names]
+        return coerce_schema(batch.to_table(columns=columns).to_pandas())
+
+    def aggregates(self, start=None, end=None):
+        """
+        build_eda_cube() result for an inclusive date range, or None when it has no orders.
+
+        Months the range covers in full come from their cached partials; only the
+        boundary months are scanned.
+        """
+        if start is None and end is None:
+            partials = [self.month_partial()]
+        else:
+            lo = pd.Timestamp(start).normalize() if start is not None else None
+            hi = pd.Timestamp(end).normalize() if end is not None else None
+            partials = []
+            for month in self.months_between(start, end):
+                first, last = _month_bounds(month)
+                if (lo is None or lo <= first) and (hi is None or hi >= last):
+                    partials.append(self.month_partial(month))
+                else:
+                    chunks = self.iter_chunks(start, end, months=[month], columns=CUBE_COLUMNS)
+                    partials.extend(partial_eda(chunk) for chunk in chunks)
+        partials = [p for p in partials if p is not None]
+        if not partials:
+            return None
+        return finish_eda(merge_eda(partials))
+
+
+# ----------------------------
+# CLI
+# ----------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the partitioned order history.")
+    parser.add_argument('--root', default=REGISTRY_ROOT)
+    commands = parser.add_subparsers(dest='command', required=True)
+    append = commands.add_parser('append', help="add order files (.csv or .parquet)")
+    append.add_argument('orders', nargs='+')
+    append.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    show = commands.add_parser('show', help="list months, or summarise a date range")
+    show.add_argument('--start')
+    show.add_argument('--end')
+    args = parser.parse_args(argv)
+
+    registry = DatasetRegistry(args.root)
+    if args.command == 'append':
+        for path in args.orders:
+            months = registry.append(path, chunk_rows=args.chunk_rows)
+            print(f"{path}: {'added to ' + ', '.join(months) if months else 'already in registry'}")
+    for month in registry.months:
+        entry = registry.manifest['months'][month]
+        print(f"{month:<10} {entry['rows']:>12,} orders  {entry['memory_bytes'] / 2 ** 20:10,.1f} MiB in memory")
+    print(f"{registry.rows:,} orders in {len(registry.months)} months, {len(registry.manifest['batches'])} batches")
+    if args.command == 'show' and (args.start or args.end):
+        eda = registry.aggregates(args.start, args.end)
+        if eda is None:
+            print("No orders in range.")
+            return
+        print(f"{eda['rows']:,} orders between {args.start or 'start'} and {args.end or 'end'}")
+        print(rollup(eda['cube'], 'Product_Category').sort_values('Return_Rate', ascending=False).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
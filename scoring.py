@@ -0,0 +1,149 @@
+# scoring.py
+
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from features import customer_features
+from ingest import CHUNK_ROWS, is_parquet, iter_order_chunks
+from model import MODEL_DIR, latest_artifact, model_frame
+
+
+# ----------------------------
+# Batch Order Scoring
+# ----------------------------
+# Orders are streamed through the fitted return-risk pipeline in fixed-size chunks, so
+# memory is bounded by CHUNK_ROWS regardless of file size. Customer history features
+# for new orders are looked up in a customer table built from past orders; without one
+# they are left missing and imputed by the pipeline, never derived from the scored rows.
+RISK_THRESHOLD = 0.5
+
+
+def score_chunk(artifact, chunk, customers=None, threshold=RISK_THRESHOLD):
+    """Return-risk scores for one chunk, keyed by Order_ID when the file has one."""
+    X = model_frame(chunk, customers=customers, segmenter=artifact.get('segmenter'))
+    with warnings.catch_warnings():
+        # Customers or categories absent from training are expected and encode as all zeros
+        warnings.filterwarnings('ignore', message='Found unknown categories')
+        proba = artifact['pipeline'].predict_proba(X)[:, 1]
+    out = pd.DataFrame(index=chunk.index)
+    if 'Order_ID' in chunk.columns:
+        out['Order_ID'] = chunk['Order_ID'].to_numpy()
+    out['Return_Risk'] = proba.astype(np.float32)
+    out['High_Risk'] = proba >= threshold
+    return out
+
+
+def score_stream(artifact, source, customers=None, chunk_rows=CHUNK_ROWS, threshold=RISK_THRESHOLD):
+    """Yield one scored frame per input chunk."""
+    for chunk in iter_order_chunks(source, chunk_rows):
+        yield score_chunk(artifact, chunk, customers, threshold)
+
+
+class ScoreWriter:
+    """Append scored chunks to a CSV or Parquet file (or binary file-like) as they arrive."""
+
+    def __init__(self, target, fmt=None):
+        self.target = target
+        self.fmt = fmt or ('parquet' if is_parquet(target) else 'csv')
+        self._writer = None
+        self._header = True
+
+    def write(self, scored):
+        if self.fmt == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(scored, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.target, table.schema)
+            self._writer.write_table(table)
+        else:
+            data = scored.to_csv(index=False, header=self._header).encode()
+            if isinstance(self.target, str):
+                with open(self.target, 'ab' if not self._header else 'wb') as fh:
+                    fh.write(data)
+            else:
+                self.target.write(data)
+            self._header = False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+def score_file(artifact, source, target, customers=None, chunk_rows=CHUNK_ROWS,
+               threshold=RISK_THRESHOLD, top_k=0):
+    """
+    Score ``source`` into ``target`` chunk by chunk.
+
+    Returns a summary dict with row counts, mean risk, the high-risk share, throughput
+    and (if ``top_k``) the highest-risk orders seen, tracked without holding all scores.
+    """
+    rows = high_risk = 0
+    risk_sum = 0.0
+    top = None
+    writer = ScoreWriter(target)
+    start = time.perf_counter()
+    try:
+        for scored in score_stream(artifact, source, customers, chunk_rows, threshold):
+            writer.write(scored)
+            rows += len(scored)
+            high_risk += int(scored['High_Risk'].sum())
+            risk_sum += float(scored['Return_Risk'].to_numpy().sum(dtype=np.float64))
+            if top_k:
+                candidates = scored if top is None else pd.concat([top, scored])
+                top = candidates.nlargest(top_k, 'Return_Risk')
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - start
+    return {
+        'rows': rows,
+        'high_risk': high_risk,
+        'mean_risk': risk_sum / rows if rows else float('nan'),
+        'seconds': elapsed,
+        'rows_per_minute': rows / elapsed * 60 if elapsed else float('nan'),
+        'top': top,
+    }
+
+
+# ----------------------------
+# CLI
+# ----------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score an order file with the return-risk model.")
+    parser.add_argument('orders', help="orders to score (.csv or .parquet)")
+    parser.add_argument('-o', '--output', required=True, help="where to write scores (.csv or .parquet)")
+    parser.add_argument('--model', help=f"model artifact (default: newest in {MODEL_DIR}/)")
+    parser.add_argument('--history', help="past orders used to look up customer history features")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--threshold', type=float, default=RISK_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    model_path = args.model or latest_artifact()
+    if model_path is None or not os.path.exists(model_path):
+        sys.exit("No model artifact found; train one by opening the dashboard or pass --model.")
+    artifact = joblib.load(model_path)
+
+    customers = None
+    if args.history:
+        from ingest import load_orders
+        customers = customer_features(load_orders(args.history))
+
+    summary = score_file(artifact, args.orders, args.output, customers,
+                         chunk_rows=args.chunk_rows, threshold=args.threshold)
+    print(
+        f"Scored {summary['rows']:,} orders in {summary['seconds']:.1f}s "
+        f"({summary['rows_per_minute']:,.0f} rows/min); "
+        f"{summary['high_risk']:,} high risk, mean risk {summary['mean_risk']:.3f} -> {args.output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
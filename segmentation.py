@@ -0,0 +1,165 @@
+# segmentation.py
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import linear_sum_assignment
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.decomposition import IncrementalPCA
+from sklearn.preprocessing import StandardScaler
+
+from features import SEGMENTS, assign_segments, customer_features
+
+
+# ----------------------------
+# Customer Segmentation (K-Means + PCA)
+# ----------------------------
+# Customers are described by their order count, return rate and average order value
+# (counts and values log-scaled), standardised, reduced with PCA and clustered with
+# MiniBatchKMeans. Every stage is fitted with partial_fit over fixed-size batches, so
+# memory stays constant in the number of customers, and new customers are assigned to
+# the nearest fitted centroid without refitting.
+#
+# Clusters are named after the business segments from the notebook by their centroids:
+# each segment's prototype is the centroid of the customers the notebook's rules put in
+# it, and clusters are matched one-to-one to the nearest prototypes (minimum total
+# squared distance in the standardised feature space). A large mid-value cluster thus
+# lands on Value or Moderate Shoppers rather than on whichever name is left over.
+#
+# Segments are always derived here; a Customer_Segment column in the order file comes
+# from the rules over all orders and is ignored.
+# With too few customers to fit N_SEGMENTS clusters the segmenter falls back to the
+# notebook's segment rules.
+SEGMENT_FEATURES = ['Customer_Order_Count', 'Customer_Return_Rate', 'Customer_Avg_Order_Value']
+N_SEGMENTS = len(SEGMENTS)
+PCA_COMPONENTS = 2
+BATCH_ROWS = 100_000
+RANDOM_STATE = 42
+
+
+def _feature_matrix(customers):
+    X = customers[SEGMENT_FEATURES].to_numpy(dtype=np.float64)
+    X[:, 0] = np.log1p(X[:, 0])
+    X[:, 2] = np.log1p(np.clip(X[:, 2], 0, None))
+    return X
+
+
+def _batches(n, batch_rows, rng=None):
+    order = rng.permutation(n) if rng is not None else np.arange(n)
+    for start in range(0, n, batch_rows):
+        yield order[start:start + batch_rows]
+
+
+class CustomerSegmenter:
+    def __init__(self, batch_rows=BATCH_ROWS, random_state=RANDOM_STATE):
+        self.batch_rows = batch_rows
+        self.random_state = random_state
+        self.scaler = StandardScaler()
+        self.pca = IncrementalPCA(n_components=PCA_COMPONENTS)
+        self.kmeans = MiniBatchKMeans(n_clusters=N_SEGMENTS, random_state=random_state, n_init=3)
+        self.cluster_to_segment = None
+
+    def _scaled(self, X):
+        # Missing features sit at the mean (0 after scaling)
+        return np.nan_to_num(self.scaler.transform(X), nan=0.0)
+
+    def _embed(self, X):
+        return self.pca.transform(self._scaled(X))
+
+    def fit(self, customers):
+        """Fit scaler, PCA and K-Means on a customer feature table, batch by batch."""
+        X = _feature_matrix(customers)
+        n = len(X)
+        rng = np.random.default_rng(self.random_state)
+        # IncrementalPCA needs at least n_components rows per batch
+        batch_rows = max(self.batch_rows, PCA_COMPONENTS)
+
+        for idx in _batches(n, batch_rows):
+            self.scaler.partial_fit(X[idx])
+        for idx in _batches(n, batch_rows):
+            if len(idx) >= PCA_COMPONENTS:
+                self.pca.partial_fit(self._scaled(X[idx]))
+        for _ in range(3):
+            for idx in _batches(n, batch_rows, rng):
+                if len(idx) >= N_SEGMENTS:
+                    self.kmeans.partial_fit(self._embed(X[idx]))
+
+        if hasattr(self.kmeans, 'cluster_centers_'):
+            self.cluster_to_segment = self._name_clusters(X)
+        else:
+            # No batch had enough customers to cluster; predict() uses the segment rules
+            self.cluster_to_segment = None
+        return self
+
+    def _name_clusters(self, X):
+        # Standardised centroids of the clusters and of the rule segments, accumulated in batches
+        width = X.shape[1]
+        clusters, cluster_counts = np.zeros((N_SEGMENTS, width)), np.zeros(N_SEGMENTS)
+        prototypes, prototype_counts = np.zeros((N_SEGMENTS, width)), np.zeros(N_SEGMENTS)
+        for idx in _batches(len(X), self.batch_rows):
+            scaled = self._scaled(X[idx])
+            labels = self.kmeans.predict(self.pca.transform(scaled))
+            np.add.at(clusters, labels, scaled)
+            cluster_counts += np.bincount(labels, minlength=N_SEGMENTS)
+            # Order value is log-scaled in the feature matrix
+            rules = assign_segments(np.expm1(X[idx, 2]), X[idx, 1]).codes
+            known = rules >= 0
+            np.add.at(prototypes, rules[known], scaled[known])
+            prototype_counts += np.bincount(rules[known], minlength=N_SEGMENTS)
+        clusters /= np.maximum(cluster_counts, 1)[:, None]
+        prototypes /= np.maximum(prototype_counts, 1)[:, None]
+
+        cost = ((clusters[:, None, :] - prototypes[None, :, :]) ** 2).sum(axis=2)
+        # A segment the rules give no customers has no prototype and takes the cluster left over
+        cost[:, prototype_counts == 0] = cost.max() + 1
+        cluster_ids, segment_codes = linear_sum_assignment(cost)
+        mapping = np.empty(N_SEGMENTS, dtype=np.int64)
+        mapping[cluster_ids] = segment_codes
+        return mapping
+
+    def predict(self, customers):
+        """Segment for each row of a customer feature table (rows without history are unlabelled)."""
+        if self.cluster_to_segment is None:
+            return assign_segments(customers['Customer_Avg_Order_Value'], customers['Customer_Return_Rate'])
+        X = _feature_matrix(customers)
+        codes = np.full(len(X), -1, dtype=np.int64)
+        known = ~np.isnan(X).any(axis=1)
+        for idx in _batches(len(X), self.batch_rows):
+            idx = idx[known[idx]]
+            if len(idx):
+                codes[idx] = self.cluster_to_segment[self.kmeans.predict(self._embed(X[idx]))]
+        return pd.Categorical.from_codes(codes, categories=SEGMENTS)
+
+    def embedding(self, customers):
+        """2-D PCA coordinates used for plotting."""
+        return self._embed(_feature_matrix(customers))
+
+
+def fit_segments(df):
+    """Fit a segmenter on the customers in ``df``; returns (segmenter, customer table with labels)."""
+    customers = customer_features(df)
+    segmenter = CustomerSegmenter().fit(customers)
+    customers['Customer_Segment'] = segmenter.predict(customers)
+    return segmenter, customers
+
+
+def order_segments(df, customers):
+    """Segment label for every order row, looked up from a labelled customer table."""
+    positions = customers.index.get_indexer(df['Customer_ID'])
+    segment_codes = customers['Customer_Segment'].cat.codes.to_numpy()
+    codes = np.where(positions >= 0, segment_codes[positions], -1)
+    return pd.Series(
+        pd.Categorical.from_codes(codes, categories=SEGMENTS),
+        index=df.index, name='Customer_Segment',
+    )
+
+
+def segment_summary(customers):
+    """Average order value, return rate (%) and customer share (%) per segment."""
+    grouped = customers.groupby('Customer_Segment', observed=True)
+    summary = pd.DataFrame({
+        'Avg_Order_Value': grouped['Customer_Avg_Order_Value'].mean(),
+        'Return_Rate': grouped['Customer_Return_Rate'].mean() * 100,
+        'Customer_Pct': grouped.size() / len(customers) * 100,
+    })
+    summary.index.name = 'Segment'
+    return summary.reset_index()
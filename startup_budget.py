@@ -0,0 +1,99 @@
+# startup_budget.py
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+
+# ----------------------------
+# Startup Budget
+# ----------------------------
+# Renders each dashboard page headlessly (streamlit.testing AppTest) in a fresh Python
+# process, so every measurement is cold: no imported modules and no cached data. The
+# first run renders the default page (the replica's time to ready); other pages are then
+# selected and timed on their own. Text-only pages must render within TEXT_PAGE_BUDGET
+# seconds without importing any of HEAVY_MODULES; data pages are measured and reported
+# but only need to render cleanly. numpy is not listed because st.image imports it.
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+PAGES = [
+    "Introduction",
+    "Exploratory Data Analysis",
+    "Machine Learning Models",
+    "What-If Simulator",
+    "A/B Testing Insights",
+    "Order Scoring",
+    "Project Summary",
+]
+TEXT_PAGES = ["Introduction", "Project Summary"]
+TEXT_PAGE_BUDGET = 1.5
+HEAVY_MODULES = ['pandas', 'pyarrow', 'altair', 'scipy', 'sklearn', 'joblib']
+
+_CHILD = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+app_path, page, timeout = sys.argv[1], sys.argv[2], float(sys.argv[3])
+start = time.perf_counter()
+at = AppTest.from_file(app_path, default_timeout=timeout).run()
+startup = seconds = time.perf_counter() - start
+if page != at.sidebar.selectbox[0].value:
+    start = time.perf_counter()
+    at.sidebar.selectbox[0].set_value(page).run()
+    seconds = time.perf_counter() - start
+print(json.dumps({
+    'startup': startup,
+    'seconds': seconds,
+    'errors': [e.message for e in at.exception],
+    'modules': [m for m in HEAVY if m in sys.modules],
+}))
+"""
+
+
+def measure_page(page, app_path=APP_PATH, timeout=600):
+    """Cold render of one page in a subprocess: startup and page seconds, errors and heavy modules loaded."""
+    code = f"HEAVY = {HEAVY_MODULES!r}\n" + _CHILD
+    proc = subprocess.run(
+        [sys.executable, "-c", code, app_path, page, str(timeout)],
+        capture_output=True, text=True, cwd=os.getcwd(),
+    )
+    if proc.returncode != 0:
+        return {'startup': float('nan'), 'seconds': float('nan'), 'errors': proc.stderr.strip().splitlines()[-1:], 'modules': []}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def check_budget(pages=PAGES, budget=TEXT_PAGE_BUDGET, app_path=APP_PATH):
+    """Measure ``pages``; returns (rows, failures) where each failure is a readable message."""
+    rows, failures = [], []
+    for page in pages:
+        result = measure_page(page, app_path)
+        result['page'] = page
+        rows.append(result)
+        if result['errors']:
+            failures.append(f"{page}: {result['errors'][0]}")
+        if page in TEXT_PAGES:
+            if not result['seconds'] <= budget:
+                failures.append(f"{page}: {result['seconds']:.2f}s exceeds the {budget:.2f}s budget")
+            if result['modules']:
+                failures.append(f"{page}: imported {', '.join(result['modules'])}")
+    return rows, failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold-start render time of each dashboard page.")
+    parser.add_argument('pages', nargs='*', default=PAGES, help="pages to measure (default: all)")
+    parser.add_argument('--budget', type=float, default=TEXT_PAGE_BUDGET,
+                        help="seconds allowed for text-only pages")
+    args = parser.parse_args(argv)
+
+    rows, failures = check_budget(args.pages, args.budget)
+    for row in rows:
+        heavy = ', '.join(row['modules']) or '-'
+        print(f"{row['page']:<28} {row['seconds']:6.2f}s (startup {row['startup']:.2f}s)  heavy imports: {heavy}")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
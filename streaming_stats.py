@@ -0,0 +1,184 @@
+# streaming_stats.py
+
+import numpy as np
+import pandas as pd
+
+
+# ----------------------------
+# Mergeable Summary Statistics
+# ----------------------------
+# Small summaries that are built chunk by chunk (or shard by shard) and merged, so the
+# EDA statistics never need whole columns in memory:
+#
+# - CoMoments keeps counts, means and centred second moments for every pair of columns
+#   over the rows where both are present, i.e. pandas' pairwise-complete corr(). A chunk
+#   is summarised around its own means and chunks are combined with the parallel form of
+#   Welford's update (Chan et al.), which avoids the cancellation of raw sums.
+# - QuantileSketch is a log-bucketed quantile sketch (DDSketch). A value is counted in
+#   bucket i when gamma^(i-1) < |value| <= gamma^i with gamma = (1 + alpha) / (1 - alpha),
+#   so every quantile comes back within relative error alpha, merging adds bucket
+#   counts, and order values spanning six decades need under a thousand buckets.
+SKETCH_ALPHA = 0.01
+_MIN_INDEXABLE = 1e-9
+
+
+class CoMoments:
+    def __init__(self, columns):
+        k = len(columns)
+        self.columns = list(columns)
+        # [i, j] entries describe column i over the rows where columns i and j are both present
+        self.n = np.zeros((k, k))
+        self.mean = np.zeros((k, k))
+        self.m2 = np.zeros((k, k))
+        # Centred cross products of columns i and j over the same rows
+        self.cross = np.zeros((k, k))
+
+    @classmethod
+    def from_array(cls, X, columns):
+        """Summarise a 2-D array (NaN = missing) with one column per entry of ``columns``."""
+        X = np.asarray(X, dtype=np.float64)
+        out = cls(columns)
+        rows, k = X.shape
+        # Column sums go through BLAS: axis-0 reductions of a tall C-ordered block are far slower
+        ones = np.ones(rows)
+        missing = np.isnan(X)
+        if missing.any():
+            M = (~missing).astype(np.float64)
+            counts = ones @ M
+            sums = ones @ np.where(missing, 0.0, X)
+        else:
+            M = None
+            counts = np.full(k, float(rows))
+            sums = ones @ X
+        # Centre on the column means first so the sums below stay well conditioned
+        shift = np.divide(sums, counts, out=np.zeros(k), where=counts > 0)
+        Xs = X - shift
+        if M is not None:
+            Xs[missing] = 0.0
+        gram = Xs.T @ Xs
+        if M is not None:
+            n = M.T @ M
+            mean = np.divide(Xs.T @ M, n, out=np.zeros_like(n), where=n > 0)
+            squares = (Xs * Xs).T @ M
+        else:
+            # Every pair shares all rows, so the diagonal of the Gram matrix has the squares
+            n = np.full((k, k), float(rows))
+            mean = np.repeat((ones @ Xs / max(rows, 1))[:, None], k, axis=1)
+            squares = np.repeat(np.diag(gram)[:, None], k, axis=1)
+        out.n = n
+        out.mean = mean + shift[:, None]
+        out.m2 = squares - n * mean ** 2
+        out.cross = gram - n * mean * mean.T
+        return out
+
+    def merge(self, other):
+        """Summary of the union of both row sets."""
+        out = CoMoments(self.columns)
+        out.n = self.n + other.n
+        weight = np.divide(other.n, out.n, out=np.zeros_like(out.n), where=out.n > 0)
+        delta = other.mean - self.mean
+        # n_a * n_b / n
+        factor = self.n * weight
+        out.mean = self.mean + delta * weight
+        out.m2 = self.m2 + other.m2 + delta ** 2 * factor
+        out.cross = self.cross + other.cross + delta * delta.T * factor
+        return out
+
+    def update(self, X):
+        """Fold a new block of rows into this summary in place."""
+        merged = self.merge(CoMoments.from_array(X, self.columns))
+        self.n, self.mean, self.m2, self.cross = merged.n, merged.mean, merged.m2, merged.cross
+        return self
+
+    def corr(self):
+        """Pearson correlation matrix with pairwise-complete observations."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = self.cross / np.sqrt(self.m2 * self.m2.T)
+        corr[self.n < 2] = np.nan
+        np.fill_diagonal(corr, np.where(np.isfinite(np.diag(corr)), 1.0, np.nan))
+        return pd.DataFrame(np.clip(corr, -1.0, 1.0), index=self.columns, columns=self.columns)
+
+
+class QuantileSketch:
+    def __init__(self, alpha=SKETCH_ALPHA):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.positive = {}
+        self.negative = {}
+        self.zero_count = 0
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def _add(self, store, magnitudes):
+        if not len(magnitudes):
+            return
+        keys = np.ceil(np.log(magnitudes) / np.log(self.gamma)).astype(np.int64)
+        # Keys span a few hundred values, so counting beats sorting
+        first = int(keys.min())
+        counts = np.bincount(keys - first)
+        for offset in np.flatnonzero(counts).tolist():
+            store[first + offset] = store.get(first + offset, 0) + int(counts[offset])
+
+    def update(self, values):
+        """Count an array of values (NaN is ignored); returns the sketch."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+        self.count += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.zero_count += int((np.abs(values) < _MIN_INDEXABLE).sum())
+        self._add(self.positive, values[values >= _MIN_INDEXABLE])
+        self._add(self.negative, -values[values <= -_MIN_INDEXABLE])
+        return self
+
+    def merge(self, other):
+        """Sketch of both inputs (the sketches must share alpha)."""
+        if other.alpha != self.alpha:
+            raise ValueError("Cannot merge sketches with different alpha")
+        out = QuantileSketch(self.alpha)
+        for store, a, b in [(out.positive, self.positive, other.positive), (out.negative, self.negative, other.negative)]:
+            store.update(a)
+            for key, count in b.items():
+                store[key] = store.get(key, 0) + count
+        out.zero_count = self.zero_count + other.zero_count
+        out.count = self.count + other.count
+        out.min, out.max = min(self.min, other.min), max(self.max, other.max)
+        return out
+
+    def _buckets(self):
+        """Representative value and count of every bucket, in ascending value order."""
+        def side(store, sign):
+            keys = np.fromiter(store, dtype=np.int64, count=len(store))
+            counts = np.fromiter(store.values(), dtype=np.int64, count=len(store))
+            values = sign * 2 * self.gamma ** keys / (self.gamma + 1)
+            order = np.argsort(values)
+            return values[order], counts[order]
+        neg_values, neg_counts = side(self.negative, -1.0)
+        pos_values, pos_counts = side(self.positive, 1.0)
+        values = np.concatenate([neg_values, [0.0], pos_values])
+        counts = np.concatenate([neg_counts, [self.zero_count], pos_counts])
+        return np.clip(values, self.min, self.max), counts
+
+    def quantile(self, q):
+        """Value at quantile(s) ``q`` within relative error alpha (NaN when empty)."""
+        scalar = np.ndim(q) == 0
+        q = np.atleast_1d(np.asarray(q, dtype=np.float64))
+        if not self.count:
+            out = np.full(len(q), np.nan)
+        else:
+            values, counts = self._buckets()
+            position = np.searchsorted(np.cumsum(counts), q * (self.count - 1), side='right')
+            out = values[np.minimum(position, len(values) - 1)]
+        return out[0] if scalar else out
+
+    def histogram(self, bins):
+        """``bins`` equal-width bins over [min, max], like np.histogram(values, bins)."""
+        if not self.count:
+            return np.histogram([], bins=bins)
+        values, counts = self._buckets()
+        lo, hi = (self.min - 0.5, self.max + 0.5) if self.min == self.max else (self.min, self.max)
+        hist, edges = np.histogram(values, bins=bins, range=(lo, hi), weights=counts)
+        return hist.astype(np.int64), edges
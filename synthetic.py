@@ -0,0 +1,319 @@
+# synthetic.py
+
+import argparse
+import functools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+from features import assign_segments
+from ingest import is_parquet
+
+
+# ----------------------------
+# Synthetic Order Generator
+# ----------------------------
+# Orders with the wayfair_part2.csv columns, for load testing without production data.
+# Marginals follow the December 2016 file:
+# - Desktop/Mobile Web split about 75/25.
+# - Guarantees shown on 32.4% of orders, raising order value about 9%.
+# - About 25% of deliveries late and 3% without a delivery date (status Unknown,
+#   no delivery days).
+# - Order values are the midpoints of the file's price bands.
+# - An overall return rate of about 6%.
+#
+# Return probability is a logistic model with these terms:
+# - a per-category base rate (highest for Rugs, Seasonal Decor and Lighting);
+# - a large effect for late delivery;
+# - smaller effects for order value, platform and guarantee (which helps Bedding most);
+# - a per-customer propensity.
+# Large-parcel categories ship slower and arrive late more often.
+#
+# Each customer's traits are a hash of Customer_ID, and each chunk has its own seed
+# spawned from the run seed. So chunks can be generated in any order, by any number
+# of processes, and the output is the same for a given seed and chunk size.
+#
+# Like the source file, every order also carries its customer's Customer_Order_Count,
+# Customer_Return_Rate and Customer_Avg_Order_Value over the whole file (its own outcome
+# included) and the notebook's rule-based Customer_Segment on them. These need every
+# chunk's orders, so a multi-chunk file is generated in two passes: the first collects
+# the per-customer totals, the second regenerates the chunks with the columns filled in.
+# Category: (share of orders, base return rate, large parcel)
+CATEGORY_PROFILES = {
+    'Bedding': (0.16, 0.060, False),
+    'Decorative Accents': (0.12, 0.050, False),
+    'Rugs': (0.10, 0.105, False),
+    'Furniture - Bedroom': (0.09, 0.065, True),
+    'Kitchen': (0.08, 0.035, False),
+    'Lighting': (0.07, 0.080, False),
+    'Seasonal Decor': (0.07, 0.095, False),
+    'Storage & Organization': (0.07, 0.045, False),
+    'Bath': (0.07, 0.050, False),
+    'Tabletop': (0.06, 0.040, False),
+    'Furniture - Kitchen': (0.06, 0.060, True),
+    'Heating & Grills': (0.05, 0.045, True),
+}
+# Change in return log-odds when a guarantee is shown
+GUARANTEE_EFFECTS = {'Bedding': -0.16, 'Lighting': -0.02, 'Rugs': 0.03, 'Tabletop': 0.02}
+PLATFORMS = {'Desktop': 0.747, 'Mobile Web': 0.253}
+DELIVERY_STATUSES = ['Early', 'On Time', 'Late', 'Unknown']
+# P(status) for small and large parcels
+DELIVERY_MIX = {False: [0.36, 0.39, 0.22, 0.03], True: [0.22, 0.33, 0.42, 0.03]}
+# Return log-odds added for each delivery status
+DELIVERY_EFFECTS = [-0.15, 0.0, 0.65, -0.9]
+GUARANTEE_RATE = 0.324
+PRICE_BAND_EDGES = [0, 20, 40, 60, 80, 100, 150, 200, 250, 300, 400, 500, 750, 1000]
+# Order value: lognormal with this log-mean and log-sd before banding
+VALUE_LOG_MEAN = 4.4
+VALUE_LOG_SD = 0.9
+GUARANTEE_VALUE_LIFT = 0.09
+ORDERS_PER_CUSTOMER = 1.6
+# Customer propensity: (share of customers, return log-odds shift)
+CUSTOMER_TYPES = [(0.05, 1.9), (0.29, 0.35), (0.56, -0.45), (0.10, -0.6)]
+# Calibrates the overall return rate back to the base rates once the terms above are added
+RETURN_INTERCEPT = -0.28
+SESSION_START = '2016-12-01'
+SESSION_DAYS = 31
+CHUNK_ROWS = 1_000_000
+
+
+def _unit_hash(ids, salt):
+    """Uniform [0, 1) value per id (splitmix64), identical in every chunk and process."""
+    with np.errstate(over='ignore'):
+        z = ids.astype(np.uint64) + np.uint64(salt) * np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+def _logit(p):
+    return np.log(p / (1 - p))
+
+
+def generate_orders(rows, seed=0, first_order=0, customers=None, start=SESSION_START, days=SESSION_DAYS,
+                    history=None):
+    """
+    ``rows`` synthetic orders with Order_IDs from ``first_order``, sessions over ``days``
+    days from ``start`` and Customer_IDs drawn from ``customers`` customers (default:
+    about ORDERS_PER_CUSTOMER orders each). ``seed`` is an int or np.random.SeedSequence.
+
+    The customer columns are computed over ``history`` (customer_history() of the whole
+    file the orders belong to), by default over these orders alone.
+    """
+    customers = customers or max(int(rows / ORDERS_PER_CUSTOMER), 1)
+    df = _orders(rows, seed, first_order, customers, start, days)
+    if history is None:
+        history = customer_history(df, customers)
+    count, returns, value = (column[df['Customer_ID'].to_numpy()] for column in history)
+    df['Customer_Order_Count'] = count
+    df['Customer_Return_Rate'] = (returns / count).astype(np.float32)
+    df['Customer_Avg_Order_Value'] = (value / count).astype(np.float32)
+    df['Customer_Segment'] = assign_segments(df['Customer_Avg_Order_Value'], df['Customer_Return_Rate'])
+    return df
+
+
+def customer_history(orders, customers):
+    """Order count, return count and order value total per Customer_ID (0 to ``customers`` - 1)."""
+    ids = orders['Customer_ID'].to_numpy()
+    return (
+        np.bincount(ids, minlength=customers).astype(np.int32),
+        np.bincount(ids, weights=orders['Has_Return'], minlength=customers).astype(np.int32),
+        np.bincount(ids, weights=orders['Order_Value_Numeric'].astype(np.float64), minlength=customers),
+    )
+
+
+def _orders(rows, seed, first_order, customers, start, days):
+    rng = np.random.default_rng(seed)
+    names = list(CATEGORY_PROFILES)
+    share, base_rate, large = (np.array(v) for v in zip(*CATEGORY_PROFILES.values()))
+
+    category = rng.choice(len(names), rows, p=share / share.sum()).astype(np.int16)
+    platform = (rng.random(rows) < PLATFORMS['Mobile Web']).astype(np.int8)
+    guarantee = (rng.random(rows) < GUARANTEE_RATE).astype(np.int8)
+    customer = rng.integers(0, customers, rows)
+    session = np.datetime64(start, 'D') + rng.integers(0, days, rows).astype('timedelta64[D]')
+
+    # Delivery status by parcel size, then days consistent with it
+    is_large = large[category].astype(bool)
+    mix = np.array([DELIVERY_MIX[False], DELIVERY_MIX[True]]).cumsum(axis=1)
+    status = (rng.random(rows)[:, None] > mix[is_large.astype(np.int8)]).sum(axis=1).astype(np.int8)
+    estimate = np.where(is_large, 9, 4) + rng.poisson(np.where(is_large, 4, 2))
+    delay = np.select(
+        [status == 0, status == 2],
+        [-rng.integers(1, 4, rows), rng.geometric(0.35, rows)],
+        0,
+    )
+    delivery_days = np.maximum(estimate + delay, 1).astype(np.float32)
+    delivery_days[status == 3] = np.nan
+
+    # Order value banded like the source file (midpoints; the top band is open-ended)
+    latent = rng.lognormal(VALUE_LOG_MEAN + GUARANTEE_VALUE_LIFT * guarantee, VALUE_LOG_SD)
+    edges = np.asarray(PRICE_BAND_EDGES, dtype=np.float64)
+    mids = np.append((edges[:-1] + edges[1:]) / 2, edges[-1] * 1.25)
+    value = mids[np.searchsorted(edges, latent, side='right') - 1].astype(np.float32)
+
+    # Return probability: logistic in the category, delivery, value, platform,
+    # guarantee and customer terms
+    kind = np.searchsorted(np.cumsum([s for s, _ in CUSTOMER_TYPES]), _unit_hash(customer, 1), side='right')
+    kind = np.minimum(kind, len(CUSTOMER_TYPES) - 1)
+    guarantee_effect = np.array([GUARANTEE_EFFECTS.get(name, 0.0) for name in names])
+    log_odds = (
+        RETURN_INTERCEPT
+        + _logit(base_rate)[category]
+        + np.asarray(DELIVERY_EFFECTS)[status]
+        + 0.25 * (np.log(value) - VALUE_LOG_MEAN)
+        - 0.05 * platform
+        + guarantee * (guarantee_effect[category] - 0.02 * (1 - platform))
+        + np.array([shift for _, shift in CUSTOMER_TYPES])[kind]
+    )
+    returned = (rng.random(rows) < 1 / (1 + np.exp(-log_odds))).astype(np.int8)
+
+    return pd.DataFrame({
+        'Order_ID': np.arange(first_order, first_order + rows, dtype=np.int64),
+        'Customer_ID': customer,
+        'Customer_Session_Start_Date': session,
+        'Product_Category': pd.Categorical.from_codes(category, names),
+        'Platform_Name': pd.Categorical.from_codes(platform, list(PLATFORMS)),
+        'Has_Guarantee': guarantee,
+        'Guarantee_Shown': guarantee,
+        'Has_Return': returned,
+        'Delivery_Status': pd.Categorical.from_codes(status, DELIVERY_STATUSES),
+        'Order_Value_Numeric': value,
+        'Actual_Delivery_Days': delivery_days,
+    })
+
+
+# ----------------------------
+# Parallel Chunked Writer
+# ----------------------------
+# Chunks are generated (and for CSV also formatted) in a process pool. The parent writes
+# them to the output in order. At most two chunks per worker are in flight, so memory
+# is bounded by the chunk size, not the row count. Parquet output gets one row group per
+# chunk. CSV chunks are formatted by pyarrow (far faster than DataFrame.to_csv) into
+# bytes and appended. The per-customer totals of the first pass are handed to each
+# worker once, when it starts.
+_history = None
+
+
+def _set_history(history):
+    global _history
+    _history = history
+
+
+def _chunk_history(task):
+    _, seed, first_order, rows, customers, start, days = task
+    orders = _orders(rows, seed, first_order, customers, start, days)
+    return customer_history(orders, customers)
+
+
+def _encode_chunk(task, as_parquet):
+    index, seed, first_order, rows, customers, start, days = task
+    import pyarrow as pa
+    orders = generate_orders(rows, seed, first_order, customers, start, days, _history)
+    table = pa.Table.from_pandas(orders, preserve_index=False)
+    # Session timestamps are whole days
+    table = table.cast(pa.schema([
+        pa.field(f.name, pa.date32()) if pa.types.is_timestamp(f.type) else f for f in table.schema
+    ]))
+    if as_parquet:
+        return table
+    import pyarrow.csv as pacsv
+    # Plain strings: the CSV writer does not take dictionary columns
+    table = table.cast(pa.schema([
+        pa.field(f.name, pa.string()) if pa.types.is_dictionary(f.type) else f for f in table.schema
+    ]))
+    sink = pa.BufferOutputStream()
+    pacsv.write_csv(table, sink, pacsv.WriteOptions(include_header=index == 0))
+    return sink.getvalue().to_pybytes()
+
+
+def _in_order(fn, tasks, workers, history=None):
+    """Yield ``fn(task)`` for every task in order, computed across ``workers`` processes."""
+    if workers > 1 and len(tasks) > 1:
+        # spawn, not fork: callers may be multi-threaded
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), mp_context=get_context('spawn'),
+                                 initializer=_set_history, initargs=(history,)) as pool:
+            pending = []
+            for task in tasks:
+                pending.append(pool.submit(fn, task))
+                if len(pending) >= 2 * workers:
+                    yield pending.pop(0).result()
+            for future in pending:
+                yield future.result()
+    else:
+        _set_history(history)
+        try:
+            for task in tasks:
+                yield fn(task)
+        finally:
+            _set_history(None)
+
+
+def write_orders(path, rows, seed=0, chunk_rows=CHUNK_ROWS, workers=1, customers=None,
+                 start=SESSION_START, days=SESSION_DAYS):
+    """
+    Generate ``rows`` orders into a .csv or .parquet file at ``path``, ``chunk_rows`` at a
+    time across ``workers`` processes. The file appears atomically when complete.
+    """
+    as_parquet = is_parquet(path)
+    customers = customers or max(int(rows / ORDERS_PER_CUSTOMER), 1)
+    starts = list(range(0, rows, chunk_rows))
+    seeds = np.random.SeedSequence(seed).spawn(len(starts))
+    tasks = [
+        (i, seeds[i], first, min(chunk_rows, rows - first), customers, start, days)
+        for i, first in enumerate(starts)
+    ]
+
+    # First pass: per-customer totals over the whole file (a single chunk is its own file)
+    history = None
+    if len(tasks) > 1:
+        for totals in _in_order(_chunk_history, tasks, workers):
+            history = totals if history is None else tuple(a + b for a, b in zip(history, totals))
+
+    tmp = path + '.tmp'
+    writer = None
+    try:
+        with open(tmp, 'wb') as fh:
+            for chunk in _in_order(functools.partial(_encode_chunk, as_parquet=as_parquet), tasks, workers, history):
+                if not as_parquet:
+                    fh.write(chunk)
+                    continue
+                import pyarrow.parquet as pq
+                if writer is None:
+                    writer = pq.ParquetWriter(fh, chunk.schema)
+                writer.write_table(chunk, row_group_size=chunk_rows)
+            if writer is not None:
+                writer.close()
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic Wayfair orders for scale testing.")
+    parser.add_argument('output', help="output file (.csv or .parquet)")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="generator processes (default: all cores)")
+    parser.add_argument('--start', default=SESSION_START, help="first session date")
+    parser.add_argument('--days', type=int, default=SESSION_DAYS, help="number of session days")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    write_orders(args.output, args.rows, args.seed, args.chunk_rows, args.workers, start=args.start, days=args.days)
+    elapsed = time.perf_counter() - started
+    size = os.path.getsize(args.output) / 1024 ** 2
+    print(f"{args.rows:,} orders written to {args.output} ({size:,.0f} MB) in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
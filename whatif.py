@@ -0,0 +1,215 @@
+# whatif.py
+
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from ingest import CHUNK_ROWS
+from model import CATEGORICAL_FEATURES, NUMERIC_FEATURES, model_frame
+
+
+# ----------------------------
+# What-If Simulator
+# ----------------------------
+# The return model is a logistic regression on standardised numerics and one-hot dummies,
+# so an order's log-odds is the intercept plus one additive term per input column:
+#
+#   numeric      coef / scale * (value, or the training median when missing) - coef * mean / scale
+#   categorical  coef of the level's dummy (0 for the dropped first level and unseen levels)
+#
+# WhatIf reads those terms off the fitted pipeline and scores the whole order base once,
+# keeping the inputs as compact arrays (float32 numerics, int16 level codes) with the
+# baseline log-odds and probabilities. A scenario is a list of edits such as
+#
+#   {'column': 'Actual_Delivery_Days', 'op': 'shift', 'value': -2}
+#   {'column': 'Guarantee_Shown', 'op': 'set', 'value': 1, 'where': {'Product_Category': ['Lighting']}}
+#
+# Rescoring recomputes only the edited columns' terms on the edited rows and adds the
+# change to the cached log-odds. Expected returns and return costs per category are the
+# cached baseline sums plus a bincount over the changed rows, so a scenario over millions
+# of orders takes milliseconds to a few hundred.
+EDITABLE = {
+    'Actual_Delivery_Days': ['shift', 'set'],
+    'Guarantee_Shown': ['set'],
+    'Delivery_Status': ['set'],
+    'Customer_Segment': ['set'],
+}
+SCOPES = ['Product_Category', 'Customer_Segment', 'Platform_Name']
+UNSEEN_LEVEL = 'Other'
+# Expected cost of a return: a fixed handling cost plus a share of the order value
+RETURN_HANDLING_COST = 15.0
+RETURN_VALUE_SHARE = 0.2
+# Orders re-scored through the pipeline itself to confirm the decomposition
+CHECK_ROWS = 1000
+
+
+def linear_terms(pipeline):
+    """Intercept and per-column terms of the fitted logistic pipeline (see the module notes)."""
+    prep = pipeline.named_steps['prep']
+    coef = pipeline.named_steps['model'].coef_[0]
+    num = prep.named_transformers_['num']
+    cat = prep.named_transformers_['cat']
+    imputer, scaler = num.named_steps['impute'], num.named_steps['scale']
+    encoder = cat.named_steps['onehot']
+
+    numeric = {}
+    for j, column in enumerate(NUMERIC_FEATURES):
+        weight = coef[j] / scaler.scale_[j]
+        numeric[column] = (float(imputer.statistics_[j]), float(weight), float(-weight * scaler.mean_[j]))
+
+    categorical = {}
+    position = len(NUMERIC_FEATURES)
+    for i, column in enumerate(CATEGORICAL_FEATURES):
+        levels = [str(level) for level in encoder.categories_[i]]
+        dropped = None if encoder.drop_idx_ is None else encoder.drop_idx_[i]
+        # One slot per level plus a trailing slot for levels unseen in training
+        level_coef = np.zeros(len(levels) + 1, dtype=np.float32)
+        for k in range(len(levels)):
+            if k != dropped:
+                level_coef[k] = coef[position]
+                position += 1
+        categorical[column] = (levels, level_coef)
+    return float(pipeline.named_steps['model'].intercept_[0]), numeric, categorical
+
+
+def _sigmoid(logit):
+    return (1.0 / (1.0 + np.exp(-logit))).astype(np.float32)
+
+
+class WhatIf:
+    def __init__(self, pipeline, df, customers=None, segmenter=None, chunk_rows=CHUNK_ROWS):
+        if 'Order_Value_Numeric' not in df.columns:
+            raise ValueError("The what-if simulator needs an Order_Value_Numeric column")
+        self.intercept, self.numeric_terms, self.categorical_terms = linear_terms(pipeline)
+        self.rows = n = len(df)
+        self.values = {column: np.empty(n, dtype=np.float32) for column in NUMERIC_FEATURES}
+        self.codes = {column: np.empty(n, dtype=np.int16) for column in CATEGORICAL_FEATURES}
+        # Model inputs are built in slices, so only one slice of object columns exists at a time
+        for start in range(0, n, chunk_rows):
+            stop = min(start + chunk_rows, n)
+            X = model_frame(df.iloc[start:stop], customers=customers, segmenter=segmenter)
+            for column in NUMERIC_FEATURES:
+                self.values[column][start:stop] = X[column].to_numpy(dtype=np.float32)
+            for column in CATEGORICAL_FEATURES:
+                self.codes[column][start:stop] = self._encode(column, X[column])
+        self.order_value = df['Order_Value_Numeric'].to_numpy(dtype=np.float32)
+
+        # Baseline log-odds, and how far each input moves them across orders on average
+        self.logit = np.full(n, self.intercept, dtype=np.float32)
+        effects = {}
+        for column in NUMERIC_FEATURES + CATEGORICAL_FEATURES:
+            term = self.contribution(column, self._inputs(column))
+            self.logit += term
+            effects[column] = float(np.abs(term - term.mean()).mean()) if n else 0.0
+        self.proba = _sigmoid(self.logit)
+        self.importance = pd.DataFrame({'Feature': list(effects), 'Mean_Abs_Effect': list(effects.values())})
+        self.importance = self.importance.sort_values('Mean_Abs_Effect', ascending=False, ignore_index=True)
+        if n:
+            self._check(pipeline, df.iloc[:CHECK_ROWS], customers, segmenter)
+
+        # Baseline sums per category: orders, expected returns and value-weighted returns
+        self.categories = self.levels('Product_Category')
+        group = self.codes['Product_Category']
+        bins = len(self.categories)
+        self._orders = np.bincount(group, minlength=bins)
+        self._returns = np.bincount(group, weights=self.proba, minlength=bins)
+        self._value_returns = np.bincount(group, weights=self.proba * self.order_value, minlength=bins)
+
+    def _check(self, pipeline, sample, customers, segmenter):
+        with warnings.catch_warnings():
+            warnings.filterwarnings('ignore', message='Found unknown categories')
+            expected = pipeline.predict_proba(model_frame(sample, customers=customers, segmenter=segmenter))[:, 1]
+        if not np.allclose(self.proba[:len(sample)], expected, atol=1e-4):
+            raise ValueError("The return model is not a linear pipeline the simulator can decompose")
+
+    def levels(self, column):
+        """Level labels of a categorical input, indexed by code (the last is UNSEEN_LEVEL)."""
+        return self.categorical_terms[column][0] + [UNSEEN_LEVEL]
+
+    def _encode(self, column, values):
+        levels = self.categorical_terms[column][0]
+        # Missing values are imputed as 'Unknown' by the pipeline
+        labels = pd.Series(values, dtype=object).fillna('Unknown').astype(str)
+        codes = pd.Categorical(labels, categories=levels).codes.astype(np.int16)
+        codes[codes < 0] = len(levels)
+        return codes
+
+    def _inputs(self, column):
+        return self.values[column] if column in self.values else self.codes[column]
+
+    def contribution(self, column, inputs):
+        """Log-odds term of ``column`` for input values (numerics) or level codes (categoricals)."""
+        if column in self.numeric_terms:
+            fill, weight, offset = self.numeric_terms[column]
+            return np.where(np.isnan(inputs), np.float32(fill), inputs) * np.float32(weight) + np.float32(offset)
+        return self.categorical_terms[column][1][inputs]
+
+    def select(self, where=None):
+        """Boolean mask of the orders matching ``where`` ({column: [levels]}), or None for all orders."""
+        mask = None
+        for column, selected in (where or {}).items():
+            if column not in SCOPES:
+                raise ValueError(f"Cannot scope a scenario by {column}; choose from {SCOPES}")
+            # A per-level lookup table beats np.isin over millions of codes
+            keep = np.isin(self.levels(column), list(selected))
+            match = keep[self.codes[column]]
+            mask = match if mask is None else mask & match
+        return mask
+
+    def _edited(self, column, current, edit):
+        if column not in EDITABLE or edit['op'] not in EDITABLE[column]:
+            raise ValueError(f"Unsupported edit {edit['op']!r} on {column}")
+        if column in self.values:
+            if edit['op'] == 'shift':
+                # Delivery days cannot go below same-day; missing values stay missing
+                return np.maximum(current + np.float32(edit['value']), np.float32(0))
+            return np.full_like(current, edit['value'])
+        levels = self.levels(column)
+        if edit['value'] not in levels:
+            raise ValueError(f"Unknown {column} level {edit['value']!r}")
+        return np.full_like(current, levels.index(edit['value']))
+
+    def simulate(self, edits, handling_cost=RETURN_HANDLING_COST, value_share=RETURN_VALUE_SHARE):
+        """Baseline and scenario orders, expected returns and return costs per product category."""
+        edited, changed = {}, np.zeros(self.rows, dtype=bool)
+        for edit in edits:
+            column = edit['column']
+            if edit['op'] == 'set' and list((edit.get('where') or {}).get(column, [])) == [edit['value']]:
+                # Setting the only level the edit is scoped to changes no order
+                continue
+            mask = self.select(edit.get('where'))
+            if mask is not None and not mask.any():
+                continue
+            current = edited.setdefault(column, self._inputs(column).copy())
+            if mask is None:
+                current[:] = self._edited(column, current, edit)
+                changed[:] = True
+            else:
+                current[mask] = self._edited(column, current[mask], edit)
+                changed |= mask
+
+        # Only the edited columns' terms are recomputed, and only on the changed orders
+        rows = slice(None) if changed.all() else np.flatnonzero(changed)
+        logit = np.array(self.logit[rows])
+        for column, values in edited.items():
+            logit += self.contribution(column, values[rows]) - self.contribution(column, self._inputs(column)[rows])
+        delta = _sigmoid(logit) - self.proba[rows]
+
+        group = self.codes['Product_Category'][rows]
+        bins = len(self.categories)
+        returns_delta = np.bincount(group, weights=delta, minlength=bins)
+        value_delta = np.bincount(group, weights=delta * self.order_value[rows], minlength=bins)
+        out = pd.DataFrame({
+            'Product_Category': self.categories,
+            'Orders': self._orders,
+            'Changed_Orders': np.bincount(group, minlength=bins),
+            'Baseline_Returns': self._returns,
+            'Scenario_Returns': self._returns + returns_delta,
+            'Baseline_Cost': handling_cost * self._returns + value_share * self._value_returns,
+            'Scenario_Cost': handling_cost * (self._returns + returns_delta)
+                             + value_share * (self._value_returns + value_delta),
+        })
+        out['Return_Delta'] = out['Scenario_Returns'] - out['Baseline_Returns']
+        out['Cost_Delta'] = out['Scenario_Cost'] - out['Baseline_Cost']
+        return out[out['Orders'] > 0].reset_index(drop=True)